@@ -1,24 +1,34 @@
-import random
+from collections import deque
+
+from simulation.rng import stream
 
 class ChickenAgent:
-    def __init__(self, name, personality="neutral", role="npc"):
+    def __init__(self, name, personality="neutral", role="npc", memory_size=50, seed=None):
         self.name = name
         self.personality = personality
         self.role = role
-        self.memory = []
+        self.memory = deque(maxlen=memory_size)
+        self.memory_version = 0  # bumps on every remember(); lets prompt caches detect changes
         self.reputation = 100
         self.trust_coins = 10
+        self.seed = seed  # this hen's stream seed (simulation/rng.py); None = global random
 
     def act(self, tick, context=None):
         """
         Default NPC actions (simple random baseline).
         Human player will override via UI.
+        context may carry "neighbors": hens within interaction range.
         """
+        rng = stream(self.seed, "act", tick)
         actions = ["peck", "spread_rumor", "propose", "vote", "ally", "sanction", "wander"]
-        action = random.choice(actions)
+        action = rng.choice(actions)
         target = None
         if action in ["peck", "spread_rumor", "ally", "sanction"]:
-            target = f"hen_{random.randint(1,4)}"
+            neighbors = (context or {}).get("neighbors") or []
+            if neighbors:
+                target = rng.choice(neighbors)
+            else:
+                action = "wander"  # nobody within reach
 
         return {
             "tick": tick,
@@ -30,5 +40,4 @@ class ChickenAgent:
 
     def remember(self, event: str):
         self.memory.append(event)
-        if len(self.memory) > 10:
-            self.memory.pop(0)
+        self.memory_version += 1
@@ -1,6 +1,8 @@
 # chickens/scenarios.py
 """
 Predefined coop scenarios with constitutions and win/lose conditions.
+Conditions take the engine's EventStore (simulation/events.py) and use
+canonical action names.
 """
 from chickens.personalities import CHICKEN_ARCHETYPES
 
@@ -15,8 +17,8 @@ SCENARIOS = [
             {"name": "hen_intern","personality":"submissive","role":"follower"},
             {"name": "hen_marketer","personality":"scheming","role":"gossip"},
         ],
-        "win": lambda rows: sum(1 for r in rows if r["action"]=="PROPOSE") >= 3,
-        "lose": lambda rows: sum(1 for r in rows if r["action"] in ("GOSSIP","spread_rumor")) > 10,
+        "win": lambda ev: ev.count("PROPOSE") >= 3,
+        "lose": lambda ev: ev.count("GOSSIP") > 10,
     },
     {
         "name": "Corrupt Coop",
@@ -26,8 +28,8 @@ SCENARIOS = [
             {"name": "hen_crony","personality":"submissive","role":"yesman"},
             {"name": "hen_spy","personality":"scheming","role":"informant"},
         ],
-        "win": lambda rows: sum(1 for r in rows if r["action"]=="SANCTION") >= 5,
-        "lose": lambda rows: sum(1 for r in rows if r["action"]=="ALLY") >= 3,
+        "win": lambda ev: ev.count("SANCTION") >= 5,
+        "lose": lambda ev: ev.count("ALLY") >= 3,
     },
     {
         "name": "Utopian Coop",
@@ -37,8 +39,8 @@ SCENARIOS = [
             {"name": "hen_scientist","personality":"curious","role":"researcher"},
             {"name": "hen_guardian","personality":"aggressive","role":"enforcer"},
         ],
-        "win": lambda rows: sum(1 for r in rows if r["action"]=="ALLY") >= 3,
-        "lose": lambda rows: sum(1 for r in rows if r["action"]=="SANCTION") >= 3,
+        "win": lambda ev: ev.count("ALLY") >= 3,
+        "lose": lambda ev: ev.count("SANCTION") >= 3,
     },
     {
         "name": "Rebellion Coop",
@@ -48,7 +50,16 @@ SCENARIOS = [
             {"name": "hen_gossip","personality":"scheming","role":"gossip"},
             {"name": "hen_guard","personality":"aggressive","role":"enforcer"},
         ],
-        "win": lambda rows: sum(1 for r in rows if r["action"]=="SANCTION") >= 2,
-        "lose": lambda rows: sum(1 for r in rows if r["action"]=="PROPOSE") >= 3,
+        "win": lambda ev: ev.count("SANCTION") >= 2,
+        "lose": lambda ev: ev.count("PROPOSE") >= 3,
     },
 ]
+
+
+def check_scenario(scenario: dict, events) -> str:
+    """Return "win", "lose" or "" for a scenario given the coop's EventStore."""
+    if scenario["win"](events):
+        return "win"
+    if scenario["lose"](events):
+        return "lose"
+    return ""
@@ -0,0 +1,65 @@
+# gpt/backends.py
+"""
+Lazy backend registry for Clucktocracy.
+Backends are registered by name with a "module:function" target that is only
+imported the first time the backend is used, so mock-only processes (CLI, HUD,
+sweep workers) never pay for torch/transformers or the HTTP stack.
+
+A backend function decides one agent's action:
+    fn(agent, tick, nearby, prompts, **config) -> action dict
+where config holds model / api_base / api_key / reasoning_effort plus the
+backend's registered defaults.
+
+Plugins register their own backends the same way:
+    register_backend("my-llm", "my_pkg.brains:act", api_base="http://...")
+"""
+
+import importlib
+from typing import Any, Callable, Dict, List, Optional, Union
+
+
+class BackendSpec:
+    def __init__(self, name: str, target: Union[str, Callable], defaults: Dict[str, Any] = None):
+        self.name = name
+        self.target = target
+        self.defaults = defaults or {}
+        self._fn: Optional[Callable] = target if callable(target) else None
+
+    @property
+    def loaded(self) -> bool:
+        return self._fn is not None
+
+    def load(self) -> Callable:
+        """Import the backend's module on first use and cache the function."""
+        if self._fn is None:
+            module, _, attr = self.target.partition(":")
+            self._fn = getattr(importlib.import_module(module), attr)
+        return self._fn
+
+
+_REGISTRY: Dict[str, BackendSpec] = {}
+
+
+def register_backend(name: str, target: Union[str, Callable], **defaults) -> BackendSpec:
+    """Register (or replace) a backend. `target` is a callable or a lazy "module:function" path."""
+    spec = BackendSpec(name, target, defaults)
+    _REGISTRY[name] = spec
+    return spec
+
+
+def get_backend(name: str) -> Optional[BackendSpec]:
+    return _REGISTRY.get(name)
+
+
+def available_backends() -> List[str]:
+    return sorted(_REGISTRY)
+
+
+# ---------------------------------------------------------
+# BUILT-IN BACKENDS
+# ---------------------------------------------------------
+register_backend("mock", "gpt.inference:_mock_action")
+register_backend("ollama", "gpt.inference:_ollama_action", api_base="http://localhost:11434/v1")
+register_backend("transformers", "gpt.inference:_transformer_action")
+register_backend("remote-api", "gpt.inference:_remote_api_action",
+                 api_base="http://localhost:8000/v1", api_key="test")
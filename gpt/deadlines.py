@@ -0,0 +1,157 @@
+# gpt/deadlines.py
+"""
+Per-tick deadlines for agent inference.
+Every agent's request gets until the deadline; agents that miss it get a fast
+fallback action (outcome "fallback") so one hung server can't stall the tick.
+Optionally the late response is kept and used as that agent's action on the
+next tick (outcome "late:<original>"), and requests still running past a
+latency percentile get a hedged duplicate; whichever answers first wins.
+Requests still queued at the deadline are cancelled; answers that end up
+unused (the losing hedge, requests abandoned while running) are billed to
+`ledger` (a gpt.usage.UsageLedger) when they finish.
+"""
+
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from gpt.usage import UsageLedger, bill_when_done
+
+Job = Callable[[], Dict[str, Any]]
+
+
+def _answered(futures: List[Future]) -> Optional[Future]:
+    """First future that finished without raising, if any."""
+    return next((f for f in futures if f.done() and f.exception() is None), None)
+
+
+class TickDeadline:
+    def __init__(
+        self,
+        deadline_s: float = 5.0,
+        carry_over: bool = False,
+        hedge_percentile: Optional[float] = None,
+        min_samples: int = 20,
+        window: int = 256,
+        max_workers: int = 16,
+    ):
+        self.deadline_s = deadline_s
+        self.carry_over = carry_over
+        self.hedge_percentile = hedge_percentile    # e.g. 0.95: hedge requests slower than p95
+        self.min_samples = min_samples              # latencies needed before hedging kicks in
+        self.max_workers = max_workers              # floor for the own pool, which grows with the flock
+        self.latencies = deque(maxlen=window)       # seconds, per completed request
+        self.pending: Dict[str, Future] = {}        # agent name -> late request (carry_over)
+        self.stats = {"requests": 0, "fallbacks": 0, "late": 0, "hedged": 0, "hedge_wins": 0}
+        self.ledger: Optional[UsageLedger] = None  # set by CoopEngine to its usage ledger
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._workers = 0
+
+    # ------------------------------------------------------------------
+    def _own_executor(self, n_jobs: int) -> ThreadPoolExecutor:
+        """
+        Own worker pool, used when the caller doesn't pass one. It has room for
+        every job plus a straggler or hedge each, so no request waits in the
+        queue behind another (threads are only started as they're needed).
+        """
+        workers = max(self.max_workers, 2 * n_jobs)
+        if self._executor is None or self._workers < workers:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)  # requests already running still finish
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="coop-deadline")
+            self._workers = workers
+        return self._executor
+
+    def hedge_after(self) -> Optional[float]:
+        """Seconds after which a still-running request is duplicated (None: no hedging yet)."""
+        if self.hedge_percentile is None or len(self.latencies) < self.min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(self.hedge_percentile * (len(ordered) - 1))]
+
+    def _submit(self, executor, job: Job) -> Future:
+        started = time.monotonic()
+
+        def timed():
+            out = job()
+            self.latencies.append(time.monotonic() - started)
+            return out
+
+        self.stats["requests"] += 1
+        return executor.submit(timed)
+
+    # ------------------------------------------------------------------
+    def run(self, jobs: List[Job], fallback: Callable[[Job], Dict[str, Any]], executor=None,
+            started: float = None) -> List[Dict[str, Any]]:
+        """
+        Run one tick's agent jobs (partials from ai_action_jobs) under the deadline.
+        `fallback(job)` builds the action for an agent that missed it.
+        `started` (time.monotonic()) is when the tick's budget began, so a tick
+        split over several calls (e.g. router tiers) shares one deadline.
+        A caller's `executor` needs a worker per job (two with hedging), or
+        requests queue behind each other and miss the deadline.
+        """
+        executor = executor or self._own_executor(len(jobs))
+        start = time.monotonic() if started is None else started
+        futures: List[List[Future]] = []
+        carried = set()
+        for i, job in enumerate(jobs):
+            late = self.pending.pop(job.args[0].name, None)
+            if late is not None and self.carry_over:
+                # Don't pile a new request onto a server that hasn't answered the last one
+                futures.append([late])
+                carried.add(i)
+            else:
+                futures.append([self._submit(executor, job)])
+
+        hedge_at = self.hedge_after()
+        hedged = set()
+        while True:
+            now = time.monotonic() - start
+            waiting = [i for i, fs in enumerate(futures)
+                       if _answered(fs) is None and not all(f.done() for f in fs)]
+            if not waiting or now >= self.deadline_s:
+                break
+            if hedge_at is not None and now >= hedge_at:
+                for i in waiting:
+                    if i not in hedged and i not in carried:
+                        futures[i].append(self._submit(executor, jobs[i]))
+                        hedged.add(i)
+                        self.stats["hedged"] += 1
+                hedge_at = None
+            stop = self.deadline_s if hedge_at is None else min(hedge_at, self.deadline_s)
+            wait([f for i in waiting for f in futures[i]], timeout=stop - now, return_when=FIRST_COMPLETED)
+
+        actions = []
+        for i, job in enumerate(jobs):
+            done = _answered(futures[i])
+            if done is None:
+                act = fallback(job)
+                act["outcome"] = "fallback"
+                self.stats["fallbacks"] += 1
+                # Only a request a server is working on is worth waiting for; queued ones are dropped
+                keep = next((f for f in futures[i] if f.running()), None) if self.carry_over else None
+                if keep is not None:
+                    self.pending[job.args[0].name] = keep  # billed when used next tick
+                for f in futures[i]:
+                    if f is not keep and not f.cancel():
+                        bill_when_done(f, self.ledger)
+            else:
+                for f in futures[i]:
+                    if f is not done and not f.cancel():
+                        bill_when_done(f, self.ledger)  # the hedge that lost
+                act = dict(done.result())
+                if i in carried:
+                    act["tick"] = job.args[1]
+                    act["outcome"] = f"late:{act.get('outcome', '')}"
+                    self.stats["late"] += 1
+                if i in hedged and done is not futures[i][0]:
+                    self.stats["hedge_wins"] += 1
+            actions.append(act)
+        return actions
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
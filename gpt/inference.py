@@ -2,151 +2,313 @@
 """
 Inference backends for Clucktocracy.
 Supports: mock | ollama | transformers | remote-api (OpenAI-compatible).
+The HTTP backends accept several servers as api_base (see gpt/pool.py).
+LLM replies are parsed as the prompt's JSON {action, target, message}; replies
+that don't parse, and failed requests, fall back to the mock heuristic.
+complete_text asks the same backends for free text (e.g. bios) instead.
+Backends are dispatched through the lazy registry in gpt/backends.py; heavy
+dependencies (requests, transformers/torch) are imported on first use only.
 """
 
-import os
-import random
-import requests
-from typing import List, Dict, Any
+import json
+import threading
+import time
+from functools import lru_cache, partial
+from typing import Callable, List, Dict, Any, Optional, Tuple
 
-# Optional: Hugging Face
-try:
-    from transformers import pipeline
-except ImportError:
-    pipeline = None
+from gpt.backends import get_backend
+from gpt.pool import get_pool
+from gpt.prompting import PromptBuilder, estimate_tokens
+from simulation.events import CANONICAL_ACTIONS, canonical_action
+from simulation.rng import stream
+
+# Actions whose target must be a hen within reach (PROPOSE/VOTE target policies)
+HEN_TARGETED = ("PECK", "ALLY", "GOSSIP", "SANCTION")
+# Built-in LLM backends that complete_text can ask for free text
+TEXT_BACKENDS = ("ollama", "transformers", "remote-api")
+_JSON = json.JSONDecoder()
+
+_default_prompts = None
+
+
+def _prompts(prompts: PromptBuilder = None) -> PromptBuilder:
+    """The caller's PromptBuilder, or a shared one (template compiled once per process)."""
+    global _default_prompts
+    if prompts is not None:
+        return prompts
+    if _default_prompts is None:
+        _default_prompts = PromptBuilder()
+    return _default_prompts
+
+
+def _nearby(agent, agents, grid=None, radius=None) -> List[str]:
+    """Hens `agent` can interact with: grid neighbors if positioned, else the whole flock."""
+    if grid is not None and agent.name in grid.positions:
+        return grid.neighbors(agent.name, radius)
+    return [a.name for a in agents if a.name != agent.name]
+
+
+def _chat_completion(url: str, payload: Dict[str, Any], headers: Dict[str, str] = None, timeout: float = 15,
+                     session=None) -> Tuple[str, Dict[str, Any]]:
+    """
+    POST an OpenAI-style chat request (via `session`'s pool if given).
+    Returns the reply text and the response's `usage` block ({} if absent).
+    """
+    if session is None:
+        import requests as session  # lazy: mock-only processes never load the HTTP stack
+
+    r = session.post(url, headers=headers, json=payload, timeout=timeout)
+    r.raise_for_status()
+    body = r.json()
+    return body["choices"][0]["message"]["content"], body.get("usage") or {}
+
+
+def _usage(model: str, raw: Dict[str, Any], prompt: str, reply: str, latency_s: float) -> Dict[str, Any]:
+    """Per-request usage attached to an action; estimated from text when the server sent none."""
+    if "prompt_tokens" in raw:
+        details = raw.get("prompt_tokens_details") or {}
+        return {"model": model, "prompt_tokens": raw["prompt_tokens"],
+                "completion_tokens": raw.get("completion_tokens", 0),
+                "cached_tokens": details.get("cached_tokens") or 0, "latency_s": latency_s, "estimated": False}
+    return {"model": model, "prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(reply),
+            "cached_tokens": 0, "latency_s": latency_s, "estimated": True}
+
+
+def _failed_usage(model: str, latency_s: float) -> Dict[str, Any]:
+    """Usage of a request that got no answer: it counts as a request, but no tokens were billed."""
+    return {"model": model, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+            "latency_s": latency_s, "estimated": False, "failed": True}
+
+
+def _prompt_text(messages: List[Dict[str, str]]) -> str:
+    return "\n".join(m["content"] for m in messages)
+
+
+def _parse_reply(content: str, nearby: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    {action, target, message} from a model reply (a JSON object, possibly wrapped
+    in prose or a code fence), with the action canonicalized. None if the reply
+    isn't usable: no JSON, an unknown action, or a hen-targeted action whose
+    target is missing or out of reach.
+    """
+    start = (content or "").find("{")
+    if start < 0:
+        return None
+    try:
+        data, _ = _JSON.raw_decode(content, start)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    action = canonical_action(data.get("action"))
+    if action not in CANONICAL_ACTIONS:
+        return None
+    target = str(data["target"]) if data.get("target") else None
+    if action in HEN_TARGETED and target not in nearby:
+        return None  # covers a missing target too: nearby never holds None
+    return {"action": action, "target": target, "message": str(data.get("message") or "")}
+
+
+def _post_chat(api_base, payload: Dict[str, Any], headers: Dict[str, str] = None, timeout: float = 15,
+               session=None) -> Tuple[str, Dict[str, Any]]:
+    """
+    Chat request to `api_base`; returns (reply text, usage block).
+    A multi-endpoint api_base (list, comma-separated string or EndpointPool)
+    goes to the pool's best server for the model, with one retry on a
+    different server if that fails.
+    """
+    pool = get_pool(api_base)
+    if pool is None:
+        return _chat_completion(f"{api_base}/chat/completions", payload, headers, timeout, session)
+
+    tried, error = [], None
+    for _ in range(min(2, len(pool.endpoints))):
+        try:
+            with pool.lease(payload.get("model"), exclude=tried) as ep:
+                tried.append(ep)
+                return _chat_completion(f"{ep.url}/chat/completions", payload, headers, timeout, session)
+        except Exception as e:
+            error = e
+    raise error
 
 
 # ---------------------------------------------------------
 # MOCK BACKEND
 # ---------------------------------------------------------
-def _mock_actions(agents, tick: int) -> List[Dict[str, Any]]:
-    actions = []
-    for agent in agents:
-        if agent.name == "hen_human":
-            continue  # handled separately
-        act = random.choice(["peck", "ally", "spread_rumor", "wander", "propose", "vote"])
-        target = random.choice([a.name for a in agents if a.name != agent.name])
+def _mock_action(agent, tick: int, nearby: List[str], prompts: PromptBuilder = None, **kwargs) -> Dict[str, Any]:
+    # Keyed by (hen, tick): the same move however often or in whatever order it's asked
+    rng = stream(getattr(agent, "seed", None), "mock", tick)
+    act = rng.choice(["peck", "ally", "spread_rumor", "wander", "propose", "vote"])
+    if act == "wander" or not nearby:
+        # Nobody in range: go looking for company
+        act, target = "wander", None
+        msg = f"{agent.name} wandered off"
+    else:
+        target = rng.choice(nearby)
         msg = f"{agent.name} did {act} to {target}"
-        actions.append({
-            "tick": tick,
-            "agent": agent.name,
-            "action": act,
-            "target": target,
-            "message": msg,
-            "outcome": "ok"
-        })
-    return actions
+    return {
+        "tick": tick,
+        "agent": agent.name,
+        "action": act,
+        "target": target,
+        "message": msg,
+        "outcome": "ok"
+    }
+
+
+def fallback_action(job: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """Heuristic stand-in for an agent job (from ai_action_jobs) that missed its tick deadline."""
+    agent, tick, nearby = job.args[:3]
+    return _mock_action(agent, tick, nearby)
+
+
+def _reply_action(agent, tick: int, nearby: List[str], reply: str, outcome: str,
+                  usage: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Action parsed from a model reply. Replies that don't parse get the mock
+    heuristic instead (outcome "fallback"); the raw text is kept as `reply`.
+    """
+    parsed = _parse_reply(reply, nearby)
+    if parsed is None:
+        act = dict(_mock_action(agent, tick, nearby), outcome="fallback")
+    else:
+        act = {"tick": tick, "agent": agent.name, **parsed, "outcome": outcome}
+    act.update(reply=reply, usage=usage)
+    return act
+
+
+def _failed_action(agent, tick: int, nearby: List[str], error: Exception, usage: Dict[str, Any]) -> Dict[str, Any]:
+    """Mock heuristic for a hen whose request failed (outcome "fallback", error kept in `error`)."""
+    return dict(_mock_action(agent, tick, nearby), outcome="fallback", error=str(error), usage=usage)
 
 
 # ---------------------------------------------------------
 # OLLAMA BACKEND
 # ---------------------------------------------------------
-def _ollama_actions(agents, tick: int, model: str, api_base: str, **kwargs):
-    actions = []
-    url = f"{api_base}/chat/completions"
-    for agent in agents:
-        if agent.name == "hen_human":
-            continue
-
-        prompt = f"You are {agent.name} in a chicken coop democracy. Suggest one action."
-        payload = {
-            "model": model,
-            "messages": [
-                {"role": "system", "content": "Respond with a JSON action: {action,target,message}"},
-                {"role": "user", "content": prompt},
-            ],
-            "max_tokens": 100,
-        }
-        try:
-            r = requests.post(url, json=payload, timeout=15)
-            r.raise_for_status()
-            content = r.json()["choices"][0]["message"]["content"]
-        except Exception as e:
-            content = f"error: {e}"
-
-        actions.append({
-            "tick": tick,
-            "agent": agent.name,
-            "action": "ollama_act",
-            "target": None,
-            "message": content,
-            "outcome": "ollama"
-        })
-    return actions
+def _ollama_action(agent, tick: int, nearby: List[str], prompts: PromptBuilder, model: str, api_base: str,
+                   session=None, **kwargs) -> Dict[str, Any]:
+    payload = {
+        "model": model,
+        "messages": prompts.messages(agent, tick, nearby),
+        "max_tokens": 100,
+    }
+    prompt = _prompt_text(payload["messages"])
+    started = time.perf_counter()
+    try:
+        content, raw = _post_chat(api_base, payload, timeout=15, session=session)
+    except Exception as e:
+        return _failed_action(agent, tick, nearby, e, _failed_usage(model, time.perf_counter() - started))
+    usage = _usage(model, raw, prompt, content, time.perf_counter() - started)
+    return _reply_action(agent, tick, nearby, content, "ollama", usage)
 
 
 # ---------------------------------------------------------
 # TRANSFORMERS BACKEND
 # ---------------------------------------------------------
-def _transformer_actions(agents, tick: int, model: str, **kwargs):
-    actions = []
-    if pipeline is None:
-        return _mock_actions(agents, tick)
+_pipeline_lock = threading.Lock()
 
-    pipe = pipeline("text-generation", model=model, device_map="auto", torch_dtype="auto")
 
-    for agent in agents:
-        if agent.name == "hen_human":
-            continue
-        prompt = f"{agent.name} is a chicken politician. Give one coop action."
-        try:
-            out = pipe(prompt, max_new_tokens=50)
-            msg = out[0]["generated_text"]
-        except Exception as e:
-            msg = f"error: {e}"
+@lru_cache(maxsize=2)
+def _build_pipeline(model: str):
+    try:
+        from transformers import pipeline
+    except ImportError:
+        return None
+    return pipeline("text-generation", model=model, device_map="auto", torch_dtype="auto")
+
+
+def _load_pipeline(model: str):
+    """
+    Text-generation pipeline for `model` (built once), or None if transformers
+    is missing. Hens asking concurrently wait for one load rather than each
+    building their own copy of the model.
+    """
+    with _pipeline_lock:
+        return _build_pipeline(model)
+
+
+def _transformer_action(agent, tick: int, nearby: List[str], prompts: PromptBuilder, model: str,
+                        **kwargs) -> Dict[str, Any]:
+    pipe = _load_pipeline(model)
+    if pipe is None:
+        return _mock_action(agent, tick, nearby)
 
-        actions.append({
-            "tick": tick,
-            "agent": agent.name,
-            "action": "gen_action",
-            "target": None,
-            "message": msg,
-            "outcome": "transformers"
-        })
-    return actions
+    prompt = prompts.text(agent, tick, nearby)
+    started = time.perf_counter()
+    try:
+        out = pipe(prompt, max_new_tokens=100, return_full_text=False)
+    except Exception as e:
+        return _failed_action(agent, tick, nearby, e, _failed_usage(model, time.perf_counter() - started))
+    reply = out[0]["generated_text"]
+    usage = _usage(model, {}, prompt, reply, time.perf_counter() - started)
+    return _reply_action(agent, tick, nearby, reply, "transformers", usage)
 
 
 # ---------------------------------------------------------
 # REMOTE API BACKEND (OpenAI-compatible)
 # ---------------------------------------------------------
-def _remote_api_actions(agents, tick: int, model: str, api_base: str, api_key: str, reasoning_effort: str):
-    actions = []
+def _remote_api_action(agent, tick: int, nearby: List[str], prompts: PromptBuilder, model: str, api_base: str,
+                       api_key: str, reasoning_effort: str = "medium", session=None, **kwargs) -> Dict[str, Any]:
     headers = {"Authorization": f"Bearer {api_key}"}
-    url = f"{api_base}/chat/completions"
+    system, user = prompts.messages(agent, tick, nearby)
+    messages = [
+        system,
+        {"role": "developer", "content": f"Reasoning effort={reasoning_effort}"},
+        user,
+    ]
+    payload = {"model": model, "messages": messages, "max_tokens": 100}
 
-    for agent in agents:
-        if agent.name == "hen_human":
-            continue
+    prompt = _prompt_text(messages)
+    started = time.perf_counter()
+    try:
+        content, raw = _post_chat(api_base, payload, headers=headers, timeout=20, session=session)
+    except Exception as e:
+        return _failed_action(agent, tick, nearby, e, _failed_usage(model, time.perf_counter() - started))
+    usage = _usage(model, raw, prompt, content, time.perf_counter() - started)
+    return _reply_action(agent, tick, nearby, content, "remote", usage)
 
-        messages = [
-            {"role": "system", "content": f"You are {agent.name} in a political chicken coop."},
-            {"role": "developer", "content": f"Always respond with JSON {{action,target,message}}. Reasoning effort={reasoning_effort}"},
-            {"role": "user", "content": "Pick your next coop action."},
-        ]
-        payload = {"model": model, "messages": messages, "max_tokens": 100}
 
-        try:
-            r = requests.post(url, headers=headers, json=payload, timeout=20)
-            r.raise_for_status()
-            content = r.json()["choices"][0]["message"]["content"]
-        except Exception as e:
-            content = f"error: {e}"
-
-        actions.append({
-            "tick": tick,
-            "agent": agent.name,
-            "action": "remote_action",
-            "target": None,
-            "message": content,
-            "outcome": "remote"
-        })
-    return actions
+# ---------------------------------------------------------
+# FREE TEXT (no action parsing)
+# ---------------------------------------------------------
+def complete_text(agent, prompts: PromptBuilder, backend: str, model: str, api_base: str = None,
+                  api_key: str = None, max_tokens: int = 200, session=None) -> Dict[str, Any]:
+    """
+    The model's raw reply to `prompts` for `agent` (e.g. a bio), with no nearby
+    hens, no JSON parsing and no mock stand-in. Returns {agent, text, usage};
+    a failed request has text None and its message in `error`.
+    """
+    if backend not in TEXT_BACKENDS:
+        raise ValueError(f"backend {backend!r} has no text completion; expected one of: {', '.join(TEXT_BACKENDS)}")
+    defaults = get_backend(backend).defaults
+    started = time.perf_counter()
+    try:
+        if backend == "transformers":
+            pipe = _load_pipeline(model)
+            if pipe is None:
+                raise RuntimeError("the transformers backend needs `pip install transformers torch`")
+            prompt = prompts.text(agent, 0)
+            text, raw = pipe(prompt, max_new_tokens=max_tokens, return_full_text=False)[0]["generated_text"], {}
+        else:
+            messages = prompts.messages(agent, 0)
+            prompt = _prompt_text(messages)
+            headers = None
+            if backend == "remote-api":
+                headers = {"Authorization": f"Bearer {api_key or defaults.get('api_key')}"}
+            payload = {"model": model, "messages": messages, "max_tokens": max_tokens}
+            text, raw = _post_chat(api_base or defaults["api_base"], payload, headers=headers, timeout=20,
+                                   session=session)
+    except Exception as e:
+        return {"agent": agent.name, "text": None, "error": str(e),
+                "usage": _failed_usage(model, time.perf_counter() - started)}
+    return {"agent": agent.name, "text": text,
+            "usage": _usage(model, raw, prompt, text, time.perf_counter() - started)}
 
 
 # ---------------------------------------------------------
 # PUBLIC ENTRY POINT
 # ---------------------------------------------------------
-def generate_ai_actions(
+def ai_action_jobs(
     agents,
     tick: int,
     backend: str = "mock",
@@ -154,25 +316,68 @@ def generate_ai_actions(
     reasoning_effort: str = "medium",
     api_base: str = None,
     api_key: str = None,
-) -> List[Dict[str, Any]]:
+    grid=None,
+    radius: float = None,
+    prompts: PromptBuilder = None,
+    session=None,
+) -> List[Callable[[], Dict[str, Any]]]:
     """
-    Unified interface. Returns list of AI agent actions.
+    One zero-argument callable per AI agent, each returning that agent's action.
+    Lets callers run a tick's requests on their own executor or merge the
+    requests of several coops into one batch.
     """
+    spec = get_backend(backend) or get_backend("mock")
+    act = spec.load()
 
-    if backend == "mock":
-        return _mock_actions(agents, tick)
-
-    elif backend == "ollama":
-        return _ollama_actions(agents, tick, model=model, api_base=api_base or "http://localhost:11434/v1")
+    config = dict(spec.defaults)
+    config.update(model=model, reasoning_effort=reasoning_effort)
+    if api_base is not None:
+        config["api_base"] = api_base
+    if api_key is not None:
+        config["api_key"] = api_key
+    if session is not None:
+        config["session"] = session
+    prompts = _prompts(prompts)
 
-    elif backend == "transformers":
-        return _transformer_actions(agents, tick, model=model)
+    return [
+        partial(act, agent, tick, _nearby(agent, agents, grid, radius), prompts, **config)
+        for agent in agents
+        if agent.name != "hen_human"  # handled separately
+    ]
 
-    elif backend == "remote-api":
-        return _remote_api_actions(agents, tick, model=model,
-                                   api_base=api_base or "http://localhost:8000/v1",
-                                   api_key=api_key or "test",
-                                   reasoning_effort=reasoning_effort)
 
-    else:
-        return _mock_actions(agents, tick)
+def generate_ai_actions(
+    agents,
+    tick: int,
+    backend: str = "mock",
+    model: str = "openai/gpt-oss-20b",
+    reasoning_effort: str = "medium",
+    api_base: str = None,
+    api_key: str = None,
+    grid=None,
+    radius: float = None,
+    prompts: PromptBuilder = None,
+    executor=None,
+    session=None,
+    deadline=None,
+    started: float = None,
+) -> List[Dict[str, Any]]:
+    """
+    Unified interface. Returns list of AI agent actions.
+    If a SpatialGrid is given, targets are restricted to hens within `radius`.
+    LLM backends build prompts with `prompts` (a shared default if None).
+    With an `executor`, agents are queried concurrently; `session` shares an
+    HTTP connection pool. Unknown backends fall back to mock.
+    With a `deadline` (gpt.deadlines.TickDeadline), agents that don't answer
+    in time get a heuristic fallback action instead of stalling the tick;
+    `started` (time.monotonic()) is when the tick's budget began if earlier.
+    """
+    jobs = ai_action_jobs(agents, tick, backend=backend, model=model, reasoning_effort=reasoning_effort,
+                          api_base=api_base, api_key=api_key, grid=grid, radius=radius,
+                          prompts=prompts, session=session)
+    if deadline is not None:
+        return deadline.run(jobs, fallback_action, executor=executor, started=started)
+    if executor is None:
+        return [job() for job in jobs]
+    futures = [executor.submit(job) for job in jobs]
+    return [f.result() for f in futures]
@@ -0,0 +1,204 @@
+# gpt/pool.py
+"""
+Endpoint pools for OpenAI-compatible inference servers (Ollama, vLLM, ...).
+`api_base` may be one URL, a comma-separated string or a list of URLs / dicts
+({"url": ..., "models": [...]}) — each request then goes to the healthy
+endpoint that serves the model with the fewest outstanding requests (or the
+lowest latency EWMA). Endpoints that fail repeatedly are ejected for a while
+and retried afterwards; an optional health check polls `/models` and learns
+which models each server has.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+STRATEGIES = ("least-outstanding", "ewma")
+
+EndpointSpec = Union[str, Dict[str, Any]]
+
+
+class Endpoint:
+    def __init__(self, url: str, models: Sequence[str] = None, weight: float = 1.0):
+        self.url = url.rstrip("/")
+        self.models = set(models or ())     # empty: serves anything asked
+        self.pinned = bool(models)          # explicit affinity isn't overwritten by health checks
+        self.weight = weight
+        self.outstanding = 0
+        self.latency = None                 # EWMA seconds per request
+        self.failures = 0                   # consecutive
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def serves(self, model: Optional[str]) -> bool:
+        return not self.models or model is None or model in self.models
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def __repr__(self):
+        return f"Endpoint({self.url!r}, outstanding={self.outstanding}, latency={self.latency})"
+
+
+def parse_endpoints(api_base: Union[EndpointSpec, Sequence[EndpointSpec]]) -> List[Endpoint]:
+    """Endpoints from a URL, a comma-separated string, or a list of URLs / dicts."""
+    if isinstance(api_base, str):
+        specs = [u.strip() for u in api_base.split(",") if u.strip()]
+    elif isinstance(api_base, dict):
+        specs = [api_base]
+    else:
+        specs = list(api_base)
+    return [Endpoint(s) if isinstance(s, str) else Endpoint(**s) for s in specs]
+
+
+class EndpointPool:
+    def __init__(
+        self,
+        endpoints: Union[EndpointSpec, Sequence[EndpointSpec]],
+        strategy: str = "least-outstanding",
+        eject_after: int = 3,
+        eject_s: float = 30.0,
+        ewma_alpha: float = 0.3,
+        health_interval_s: Optional[float] = None,
+        health_timeout_s: float = 2.0,
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"unknown strategy {strategy!r}; expected one of {STRATEGIES}")
+        self.endpoints = parse_endpoints(endpoints)
+        if not self.endpoints:
+            raise ValueError("endpoint pool needs at least one URL")
+        self.strategy = strategy
+        self.eject_after = eject_after
+        self.eject_s = eject_s
+        self.alpha = ewma_alpha
+        self.health_timeout_s = health_timeout_s
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+        if health_interval_s:
+            self.start_health_checks(health_interval_s)
+
+    # ------------------------------------------------------------------
+    def _score(self, ep: Endpoint) -> float:
+        if self.strategy == "ewma":
+            # Unmeasured endpoints look fast so they get tried; queued work adds latency
+            return (ep.latency or 0.0) * (ep.outstanding + 1) / ep.weight
+        return ep.outstanding / ep.weight
+
+    def pick(self, model: Optional[str] = None, exclude: Sequence[Endpoint] = ()) -> Endpoint:
+        """Best endpoint for `model`; falls back to ejected ones rather than failing outright."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [ep for ep in self.endpoints if ep.serves(model) and ep not in exclude]
+            if not candidates:
+                candidates = [ep for ep in self.endpoints if ep not in exclude] or self.endpoints
+            live = [ep for ep in candidates if ep.healthy(now)] or candidates
+            best = min(live, key=lambda ep: (self._score(ep), ep.requests))
+            best.outstanding += 1
+            best.requests += 1
+            return best
+
+    def release(self, ep: Endpoint, elapsed: float, ok: bool):
+        with self._lock:
+            ep.outstanding -= 1
+            if ok:
+                ep.failures = 0
+                ep.latency = elapsed if ep.latency is None else (1 - self.alpha) * ep.latency + self.alpha * elapsed
+            else:
+                ep.errors += 1
+                ep.failures += 1
+                if ep.failures >= self.eject_after:
+                    ep.ejected_until = time.monotonic() + self.eject_s
+
+    @contextmanager
+    def lease(self, model: Optional[str] = None, exclude: Sequence[Endpoint] = ()) -> Iterator[Endpoint]:
+        """Pick an endpoint for one request and record how it went."""
+        ep = self.pick(model, exclude)
+        started = time.monotonic()
+        ok = False
+        try:
+            yield ep
+            ok = True
+        finally:
+            self.release(ep, time.monotonic() - started, ok)
+
+    # ------------------------------------------------------------------
+    def check(self, session=None):
+        """Poll every endpoint's /models once: eject dead ones, restore and learn models of live ones."""
+        if session is None:
+            import requests as session  # lazy, as in gpt.inference
+
+        for ep in self.endpoints:
+            try:
+                r = session.get(f"{ep.url}/models", timeout=self.health_timeout_s)
+                r.raise_for_status()
+                models = {m["id"] for m in r.json().get("data", []) if "id" in m}
+            except Exception:
+                with self._lock:
+                    ep.ejected_until = time.monotonic() + self.eject_s
+                continue
+            with self._lock:
+                ep.failures = 0
+                ep.ejected_until = 0.0
+                if models and not ep.pinned:
+                    ep.models = models
+
+    def start_health_checks(self, interval_s: float):
+        if self._health_thread is not None and self._health_thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                self.check()
+                self._stop.wait(interval_s)
+
+        self._health_thread = threading.Thread(target=loop, name="endpoint-health", daemon=True)
+        self._health_thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [{"url": ep.url, "requests": ep.requests, "errors": ep.errors, "outstanding": ep.outstanding,
+                 "latency": ep.latency, "healthy": ep.healthy(now), "models": sorted(ep.models)}
+                for ep in self.endpoints]
+
+
+# ---------------------------------------------------------
+# SHARED POOLS
+# ---------------------------------------------------------
+_pools: Dict[Any, EndpointPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(api_base, **options) -> Optional[EndpointPool]:
+    """
+    The process-wide pool for a multi-endpoint `api_base` (None for a single URL),
+    so every agent and coop using the same servers shares outstanding counts.
+    `options` (EndpointPool arguments such as strategy or health_interval_s)
+    apply when the pool is created; CLIs call this once at startup so the
+    pool the backends later look up by the same api_base is configured.
+    A health_interval_s also starts health checks on an existing pool.
+    """
+    if isinstance(api_base, EndpointPool):
+        return api_base
+    if not api_base:
+        return None
+    if isinstance(api_base, str):
+        if "," not in api_base:
+            return None
+        key = tuple(u.strip() for u in api_base.split(",") if u.strip())
+    elif isinstance(api_base, dict):
+        return get_pool([api_base], **options)
+    else:
+        key = tuple(s if isinstance(s, str) else repr(sorted(s.items())) for s in api_base)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = EndpointPool(api_base, **options)
+        elif options.get("health_interval_s"):
+            _pools[key].start_health_checks(options["health_interval_s"])
+        return _pools[key]
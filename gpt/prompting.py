@@ -0,0 +1,147 @@
+# gpt/prompting.py
+"""
+Prompt builder for LLM chicken brains.
+The chicken_prompt.txt template is compiled once into a static system prefix
+shared by every agent (so servers with prefix caching reuse it), followed by a
+short per-agent part: identity, hens in reach, and the memories that rank best
+by recency and TF-IDF relevance within a hard token budget.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "..", "prompts", "chicken_prompt.txt")
+
+_WORD = re.compile(r"[a-z0-9_]+")
+
+
+@lru_cache(maxsize=8)
+def load_template(path: str = TEMPLATE_PATH) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), no tokenizer needed."""
+    return max(1, (len(text) + 3) // 4)
+
+
+def _tokenize(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def rank_memories(memories: Sequence[str], query: str, half_life: float = 10.0,
+                  docs: Sequence[Counter] = None) -> List[Tuple[float, int]]:
+    """
+    Score memories (oldest first) by recency decay plus TF-IDF cosine similarity to `query`.
+    `docs` are the memories' term counts if the caller already has them.
+    Returns (score, index) pairs, best first.
+    """
+    if docs is None:
+        docs = [Counter(_tokenize(m)) for m in memories]
+    n = len(docs)
+    df = Counter(t for d in docs for t in d)
+    idf = {t: math.log((1 + n) / (1 + c)) + 1.0 for t, c in df.items()}
+
+    def weights(tf: Counter) -> Dict[str, float]:
+        return {t: c * idf.get(t, 1.0) for t, c in tf.items()}
+
+    q = weights(Counter(_tokenize(query)))
+    q_norm = math.sqrt(sum(v * v for v in q.values())) or 1.0
+
+    scored = []
+    for i, d in enumerate(docs):
+        w = weights(d)
+        norm = math.sqrt(sum(v * v for v in w.values())) or 1.0
+        relevance = sum(v * q.get(t, 0.0) for t, v in w.items()) / (norm * q_norm)
+        recency = 0.5 ** ((n - 1 - i) / half_life)
+        scored.append((recency + relevance, i))
+    scored.sort(key=lambda s: (-s[0], -s[1]))
+    return scored
+
+
+class PromptBuilder:
+    def __init__(self, template_path: str = TEMPLATE_PATH, memory_tokens: int = 256, half_life: float = 10.0):
+        self.prefix = load_template(template_path)
+        self.memory_tokens = memory_tokens
+        self.half_life = half_life
+        # agent name -> (cache key, selected memories, rendered memory block)
+        self._cache: Dict[str, Tuple[tuple, tuple, str]] = {}
+        # agent name -> memory text -> term counts, carried across ticks so a
+        # re-rank only tokenizes the memories added since the last one
+        self._docs: Dict[str, Dict[str, Counter]] = {}
+        # memories whose term counts were reused vs. tokenized afresh
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    def select_memories(self, memories: Sequence[str], query: str,
+                        docs: Sequence[Counter] = None) -> List[str]:
+        """Best-ranked memories that fit in the token budget, in chronological order."""
+        budget = self.memory_tokens
+        chosen = []
+        for _, i in rank_memories(memories, query, self.half_life, docs):
+            cost = estimate_tokens(memories[i]) + 1  # +1 for the bullet/newline
+            if cost > budget:
+                continue
+            budget -= cost
+            chosen.append(i)
+        return [memories[i] for i in sorted(chosen)]
+
+    def memory_block(self, agent, nearby: Sequence[str] = ()) -> str:
+        """
+        Rendered memory section for `agent`, reused until its memory or
+        surroundings change. Re-ranking is incremental: term counts of memories
+        seen on earlier ticks are kept, so only new memories get tokenized.
+        """
+        memories = list(getattr(agent, "memory", ()))
+        key = (getattr(agent, "memory_version", len(memories)), tuple(nearby))
+        cached = self._cache.get(agent.name)
+        if cached and cached[0] == key:
+            self.hits += len(memories)
+            return cached[2]
+
+        known = self._docs.get(agent.name, {})
+        docs = {}
+        for m in memories:
+            tf = known.get(m)
+            if tf is None:
+                tf = Counter(_tokenize(m))
+                self.misses += 1
+            else:
+                self.hits += 1
+            docs[m] = tf
+        self._docs[agent.name] = docs  # memories that aged out are dropped here
+
+        query = " ".join([agent.name, agent.role, agent.personality, *nearby])
+        picked = tuple(self.select_memories(memories, query, [docs[m] for m in memories]))
+        if cached and cached[1] == picked:
+            block = cached[2]
+        else:
+            block = "\n".join(f"- {m}" for m in picked) or "- (nothing notable yet)"
+        self._cache[agent.name] = (key, picked, block)
+        return block
+
+    def dynamic_part(self, agent, tick: int, nearby: Sequence[str] = ()) -> str:
+        return (
+            f"You are {agent.name}, a {agent.personality} {agent.role}.\n"
+            f"Tick: {tick}\n"
+            f"Chickens within reach: {', '.join(nearby) or 'nobody'}\n"
+            f"Memories:\n{self.memory_block(agent, nearby)}\n"
+            f"Choose your next action."
+        )
+
+    def messages(self, agent, tick: int, nearby: Sequence[str] = ()) -> List[Dict[str, str]]:
+        """Chat messages: identical system prefix for every agent, then the per-agent part."""
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "user", "content": self.dynamic_part(agent, tick, nearby)},
+        ]
+
+    def text(self, agent, tick: int, nearby: Sequence[str] = ()) -> str:
+        """Single-string prompt for plain text-generation pipelines."""
+        return f"{self.prefix}\n\n{self.dynamic_part(agent, tick, nearby)}\n"
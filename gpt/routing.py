@@ -0,0 +1,170 @@
+# gpt/routing.py
+"""
+Tiered model routing for Clucktocracy.
+Each hen is assigned to a tier (mock heuristic -> small local model -> large
+remote model) from its role, recent activity and how often others target it.
+When the projected tick cost exceeds the latency or token budget, the least
+important hens are demoted one tier at a time; groups still waiting when the
+tick runs over budget fall back to the cheapest tier.
+"""
+
+import time
+from typing import Any, Dict, List, Optional
+
+from gpt.inference import generate_ai_actions
+from gpt.prompting import estimate_tokens
+
+# Tiers are ordered cheapest -> most expensive. `min_importance` is the score
+# a hen needs to be placed in the tier before any budget demotion.
+DEFAULT_TIERS = [
+    {"name": "heuristic", "backend": "mock", "model": None, "min_importance": 0.0},
+    {"name": "small", "backend": "ollama", "model": "llama3.2:3b", "min_importance": 1.5},
+    {"name": "large", "backend": "remote-api", "model": "openai/gpt-oss-20b", "min_importance": 3.0},
+]
+
+# Roles whose decisions move coop politics the most
+PIVOTAL_ROLES = {
+    "leader", "autocrat", "strongman", "populist", "insurgent",
+    "gossip", "mediator", "enforcer", "reformer",
+}
+
+
+class TierRouter:
+    def __init__(
+        self,
+        tiers: List[Dict[str, Any]] = None,
+        pins: Dict[str, str] = None,
+        tick_budget_s: Optional[float] = None,
+        token_budget: Optional[int] = None,
+        activity_window: int = 5,
+        ewma_alpha: float = 0.3,
+    ):
+        self.tiers = tiers or DEFAULT_TIERS
+        self.pins = pins or {}  # agent name -> tier name, never demoted
+        self.tick_budget_s = tick_budget_s
+        self.token_budget = token_budget
+        self.activity_window = activity_window
+        self.alpha = ewma_alpha
+        # Per-tier EWMA of seconds and tokens per agent (mock tier is ~free)
+        self.latency = {t["name"]: 0.0 if t["backend"] == "mock" else 1.0 for t in self.tiers}
+        self.tokens = {t["name"]: 0.0 if t["backend"] == "mock" else 400.0 for t in self.tiers}
+        self.last_assignment: Dict[str, str] = {}
+        self.demotions = 0
+
+    # ------------------------------------------------------------------
+    def _tier_index(self, name: str) -> int:
+        return next(i for i, t in enumerate(self.tiers) if t["name"] == name)
+
+    def importance(self, agent, tick: int, events=None) -> float:
+        """Role weight + own recent actions + times targeted by others recently."""
+        score = 2.0 if agent.role in PIVOTAL_ROLES else 0.0
+        if agent.name == "hen_human":
+            return score
+        if events is not None and len(events):
+            since = tick - self.activity_window
+            acted = events.count(agent=agent.name, tick_from=since)
+            targeted = events.count(target=agent.name, tick_from=since)
+            score += 0.1 * acted + 0.25 * targeted
+        return score
+
+    def _cost(self, plan: Dict[str, int]) -> tuple:
+        secs = sum(self.latency[self.tiers[i]["name"]] for i in plan.values())
+        toks = sum(self.tokens[self.tiers[i]["name"]] for i in plan.values())
+        return secs, toks
+
+    def _over_budget(self, plan: Dict[str, int]) -> bool:
+        secs, toks = self._cost(plan)
+        return ((self.tick_budget_s is not None and secs > self.tick_budget_s)
+                or (self.token_budget is not None and toks > self.token_budget))
+
+    def assign(self, agents, tick: int, events=None) -> Dict[int, List[Any]]:
+        """Group agents by tier index for this tick."""
+        scores = {a.name: self.importance(a, tick, events) for a in agents}
+        plan: Dict[str, int] = {}
+        for a in agents:
+            if a.name in self.pins:
+                plan[a.name] = self._tier_index(self.pins[a.name])
+                continue
+            plan[a.name] = max(
+                (i for i, t in enumerate(self.tiers) if scores[a.name] >= t.get("min_importance", 0.0)),
+                default=0,
+            )
+
+        # Demote the least important unpinned hens until the estimate fits
+        movable = sorted((a.name for a in agents if a.name not in self.pins), key=lambda n: scores[n])
+        while self._over_budget(plan):
+            victim = next((n for n in movable if plan[n] > 0), None)
+            if victim is None:
+                break
+            plan[victim] -= 1
+            self.demotions += 1
+
+        self.last_assignment = {n: self.tiers[i]["name"] for n, i in plan.items()}
+        groups: Dict[int, List[Any]] = {}
+        for a in agents:
+            groups.setdefault(plan[a.name], []).append(a)
+        return groups
+
+    def record(self, tier: str, n_agents: int, elapsed: float, tokens: float):
+        """Update per-agent latency/token EWMAs for a tier after a batch."""
+        if n_agents <= 0:
+            return
+        a = self.alpha
+        self.latency[tier] = (1 - a) * self.latency[tier] + a * (elapsed / n_agents)
+        self.tokens[tier] = (1 - a) * self.tokens[tier] + a * (tokens / n_agents)
+
+
+# ---------------------------------------------------------
+# ROUTED INFERENCE
+# ---------------------------------------------------------
+def route_ai_actions(router: TierRouter, agents, tick: int, events=None, prompts=None,
+                     api_base: str = None, api_key: str = None, deadline=None,
+                     **kwargs) -> List[Dict[str, Any]]:
+    """
+    Like generate_ai_actions, but each tier group runs on its own backend/model.
+    Expensive tiers run first; if the tick is already over budget, remaining
+    groups are demoted to the cheapest tier. A `deadline` (TickDeadline)
+    bounds the whole tick, not each group: later groups get what is left of
+    it, and groups reached after it has passed are demoted too.
+    """
+    groups = router.assign(agents, tick, events)
+    start = time.perf_counter()
+    tick_started = time.monotonic()
+    prefix_tokens = estimate_tokens(prompts.prefix) + prompts.memory_tokens if prompts is not None else 0
+    actions: List[Dict[str, Any]] = []
+
+    for idx in sorted(groups, reverse=True):
+        group = groups[idx]
+        tier = router.tiers[idx]
+        over_budget = router.tick_budget_s is not None and time.perf_counter() - start > router.tick_budget_s
+        past_deadline = deadline is not None and time.monotonic() - tick_started >= deadline.deadline_s
+        if idx > 0 and (over_budget or past_deadline):
+            router.demotions += len(group)
+            tier = router.tiers[0]
+            for a in group:
+                router.last_assignment[a.name] = tier["name"]
+
+        t0 = time.perf_counter()
+        out = generate_ai_actions(
+            group,
+            tick=tick,
+            backend=tier["backend"],
+            model=tier.get("model") or "mock",
+            api_base=tier.get("api_base", api_base),
+            api_key=tier.get("api_key", api_key),
+            prompts=prompts,
+            deadline=deadline,
+            started=tick_started,
+            **kwargs,
+        )
+        elapsed = time.perf_counter() - t0
+        if tier["backend"] != "mock":
+            # Server-reported usage when backends attach it, else a prompt + reply estimate
+            tokens = sum(a["usage"]["prompt_tokens"] + a["usage"]["completion_tokens"] if a.get("usage")
+                         else prefix_tokens + estimate_tokens(a.get("message") or "") for a in out)
+            router.record(tier["name"], len(out), elapsed, tokens)
+        for a in out:
+            a["tier"] = tier["name"]
+        actions.extend(out)
+
+    return actions
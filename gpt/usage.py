@@ -0,0 +1,220 @@
+# gpt/usage.py
+"""
+Inference usage accounting for Clucktocracy.
+LLM backends attach a `usage` dict to each action (prompt/completion/cached
+tokens from the OpenAI-style `usage` block, or estimates where the server
+doesn't send one, plus request latency). UsageLedger totals it per hen, per
+model and per tick, along with each tick's inference wall time, so runs can
+report tokens/sec, cost per tick and the most expensive hens. CoopEngine
+appends one row per hen and model per tick to <log dir>/usage.jsonl.
+Failed requests count as requests (and errors) with zero tokens; answers that
+arrive too late to be used (hedge losers, requests abandoned at a deadline)
+are still billed, with the next tick written.
+
+    python -m gpt.usage data/coop_log --price openai/gpt-oss-20b=0.05,0.20
+"""
+
+import argparse
+import json
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+USAGE_FILE = "usage.jsonl"
+
+# USD per 1M (prompt, completion) tokens; local models are free unless priced
+DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {}
+
+COUNTERS = ("requests", "errors", "prompt_tokens", "completion_tokens", "cached_tokens", "cache_hits",
+            "estimated", "latency_s", "cost")
+
+
+def _zero() -> Dict[str, float]:
+    return dict.fromkeys(COUNTERS, 0)
+
+
+class UsageLedger:
+    def __init__(self, prices: Dict[str, Tuple[float, float]] = None):
+        self.prices = dict(DEFAULT_PRICES, **(prices or {}))
+        self.totals = _zero()
+        self.by_agent: Dict[str, Dict[str, float]] = defaultdict(_zero)
+        self.by_model: Dict[str, Dict[str, float]] = defaultdict(_zero)
+        # tick -> (agent, model) -> counters; kept until written out with take_tick()
+        # (tick None: late answers, written with whichever tick is taken next)
+        self._pending: Dict[int, Dict[tuple, Dict[str, float]]] = defaultdict(lambda: defaultdict(_zero))
+        self.tick_wall_s: Dict[int, float] = {}
+        self.ticks = 0
+        self.wall_s = 0.0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    def cost(self, model: str, prompt_tokens: float, completion_tokens: float) -> float:
+        price_in, price_out = self.prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * price_in + completion_tokens * price_out) / 1e6
+
+    def record(self, tick: Optional[int], agent: str, usage: Dict[str, Any]):
+        """Add one request's usage dict (as attached to an action by the backends)."""
+        model = usage.get("model") or "unknown"
+        row = {
+            "requests": 1,
+            "errors": 1 if usage.get("failed") else 0,
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "cached_tokens": usage.get("cached_tokens", 0),
+            "cache_hits": 1 if usage.get("cached_tokens") else 0,
+            "estimated": 1 if usage.get("estimated") else 0,
+            "latency_s": usage.get("latency_s", 0.0),
+        }
+        row["cost"] = self.cost(model, row["prompt_tokens"], row["completion_tokens"])
+        with self._lock:
+            for bucket in (self.totals, self.by_agent[agent], self.by_model[model],
+                           self._pending[tick][(agent, model)]):
+                for k, v in row.items():
+                    bucket[k] += v
+
+    def record_actions(self, actions: Iterable[Dict[str, Any]], tick: int, wall_s: float = None):
+        """Record every action carrying a `usage` dict, plus the tick's inference wall time."""
+        for act in actions:
+            if act.get("usage"):
+                self.record(tick, act["agent"], act["usage"])
+        if wall_s is not None:
+            with self._lock:
+                self.tick_wall_s[tick] = self.tick_wall_s.get(tick, 0.0) + wall_s
+                self.ticks += 1
+                self.wall_s += wall_s
+
+    def take_tick(self, tick: int) -> List[Dict[str, Any]]:
+        """Per-(hen, model) rows for a tick, removed from the pending buffer (for usage.jsonl)."""
+        with self._lock:
+            per = self._pending.pop(tick, {})
+            for key, counts in self._pending.pop(None, {}).items():
+                merged = per.setdefault(key, _zero())
+                for k, v in counts.items():
+                    merged[k] += v
+            wall = self.tick_wall_s.pop(tick, None)
+        rows = [{"tick": tick, "agent": agent, "model": model, **counts}
+                for (agent, model), counts in sorted(per.items())]
+        if wall is not None:
+            rows.append({"tick": tick, "agent": None, "model": None, "wall_s": wall})
+        return rows
+
+    # ------------------------------------------------------------------
+    def summary(self, top: int = 5) -> Dict[str, Any]:
+        """Headline numbers: tokens/sec, cost per tick, most expensive hens."""
+        with self._lock:
+            totals = dict(self.totals)
+            by_agent = {a: dict(c) for a, c in self.by_agent.items()}
+            by_model = {m: dict(c) for m, c in self.by_model.items()}
+            ticks, wall = self.ticks, self.wall_s
+
+        tokens = totals["prompt_tokens"] + totals["completion_tokens"]
+        cost = totals["cost"]
+        hens = sorted(by_agent.items(),
+                      key=lambda kv: (kv[1]["cost"], kv[1]["prompt_tokens"] + kv[1]["completion_tokens"],
+                                      kv[1]["latency_s"]),
+                      reverse=True)
+        return {
+            "requests": totals["requests"],
+            "errors": totals["errors"],
+            "prompt_tokens": totals["prompt_tokens"],
+            "completion_tokens": totals["completion_tokens"],
+            "cache_hit_rate": round(totals["cache_hits"] / totals["requests"], 3) if totals["requests"] else 0.0,
+            "estimated_share": round(totals["estimated"] / totals["requests"], 3) if totals["requests"] else 0.0,
+            "mean_latency_s": round(totals["latency_s"] / totals["requests"], 3) if totals["requests"] else 0.0,
+            "tokens_per_s": round(tokens / wall, 1) if wall else 0.0,
+            "completion_tokens_per_s": round(totals["completion_tokens"] / wall, 1) if wall else 0.0,
+            "ticks": ticks,
+            "cost": round(cost, 6),
+            "cost_per_tick": round(cost / ticks, 6) if ticks else 0.0,
+            "models": by_model,
+            "top_hens": [
+                {"agent": a, "tokens": c["prompt_tokens"] + c["completion_tokens"], "requests": c["requests"],
+                 "latency_s": round(c["latency_s"], 3), "cost": round(c["cost"], 6)}
+                for a, c in hens[:top]
+            ],
+        }
+
+    # ------------------------------------------------------------------
+    @classmethod
+    def load(cls, path: str, prices: Dict[str, Tuple[float, float]] = None) -> "UsageLedger":
+        """Rebuild a ledger from a run's usage.jsonl (or the log dir holding it)."""
+        if os.path.isdir(path):
+            path = os.path.join(path, USAGE_FILE)
+        ledger = cls(prices)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                if row["agent"] is None:
+                    ledger.ticks += 1
+                    ledger.wall_s += row["wall_s"]
+                    continue
+                if prices is not None:
+                    # Re-price with the caller's prices rather than the ones in force during the run
+                    row["cost"] = ledger.cost(row["model"], row["prompt_tokens"], row["completion_tokens"])
+                for bucket in (ledger.totals, ledger.by_agent[row["agent"]], ledger.by_model[row["model"]]):
+                    for k in COUNTERS:
+                        bucket[k] += row.get(k, 0)
+        return ledger
+
+
+def bill_when_done(future: Future, ledger: Optional[UsageLedger]):
+    """
+    Record an agent request's usage once it finishes, for answers that won't be
+    used (a hedge that lost, a request abandoned at the tick deadline): the
+    tokens were spent all the same.
+    """
+    if ledger is None:
+        return
+
+    def record(f: Future):
+        if not f.cancelled() and f.exception() is None:
+            act = f.result()
+            if act.get("usage"):
+                ledger.record(None, act["agent"], act["usage"])
+
+    future.add_done_callback(record)
+
+
+def parse_prices(specs: Optional[List[str]]) -> Dict[str, Tuple[float, float]]:
+    """'model=in,out' (USD per 1M prompt/completion tokens) -> prices dict."""
+    prices = {}
+    for spec in specs or []:
+        model, _, rates = spec.rpartition("=")
+        price_in, _, price_out = rates.partition(",")
+        prices[model] = (float(price_in), float(price_out or price_in))
+    return prices
+
+
+def format_report(summary: Dict[str, Any]) -> str:
+    lines = [
+        f"requests {summary['requests']} ({summary['errors']} failed), ticks {summary['ticks']}, "
+        f"mean latency {summary['mean_latency_s']:.3f}s",
+        f"tokens: {summary['prompt_tokens']} prompt + {summary['completion_tokens']} completion "
+        f"({summary['estimated_share']:.0%} estimated), cache hit rate {summary['cache_hit_rate']:.0%}",
+        f"throughput: {summary['tokens_per_s']} tok/s ({summary['completion_tokens_per_s']} completion tok/s)",
+        f"cost: ${summary['cost']:.4f} total, ${summary['cost_per_tick']:.6f} per tick",
+        "by model:",
+    ]
+    for model, c in sorted(summary["models"].items()):
+        lines.append(f"  {model}: {c['requests']} requests, {c['prompt_tokens'] + c['completion_tokens']} tokens")
+    lines.append("most expensive hens:")
+    for hen in summary["top_hens"]:
+        lines.append(f"  {hen['agent']}: {hen['tokens']} tokens, {hen['requests']} requests, "
+                     f"{hen['latency_s']:.2f}s, ${hen['cost']:.4f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report inference usage for a run")
+    parser.add_argument("source", help="Run log dir (data/coop_log) or a usage.jsonl file")
+    parser.add_argument("--price", action="append", default=None,
+                        help="model=in,out USD per 1M prompt/completion tokens (repeatable)")
+    parser.add_argument("--top", type=int, default=5, help="How many hens to list")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    prices = parse_prices(args.price) if args.price else None
+    summary = UsageLedger.load(args.source, prices).summary(top=args.top)
+    print(json.dumps(summary, indent=2) if args.json else format_report(summary))
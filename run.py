@@ -3,20 +3,26 @@
 import argparse
 import random
 from chickens.agent import ChickenAgent
+from gpt.backends import available_backends
+from gpt.deadlines import TickDeadline
+from gpt.pool import STRATEGIES, get_pool
+from gpt.usage import format_report, parse_prices
 from simulation.engine import CoopEngine
+from simulation.rng import SeedTree
 
 
-def build_flock(num_agents: int = 4, use_llm: bool = False):
+def build_flock(num_agents: int = 4, use_llm: bool = False, rng: random.Random = None):
     """Create a flock of chickens with varied personalities and roles."""
+    rng = rng or random
     personalities = ["aggressive", "scheming", "submissive", "zen"]
     roles = ["leader", "follower", "gossip", "follower"]
 
     agents = []
     for i in range(num_agents):
         name = f"hen_{i+1}"
-        personality = random.choice(personalities)
+        personality = rng.choice(personalities)
         role = roles[i % len(roles)]
-        agents.append(ChickenAgent(name, personality, role, use_llm=use_llm))
+        agents.append(ChickenAgent(name, personality, role))
     return agents
 
 
@@ -25,29 +31,66 @@ def main():
     parser.add_argument("--episodes", type=int, default=1, help="Number of episodes to simulate")
     parser.add_argument("--ticks", type=int, default=20, help="Number of ticks per episode")
     parser.add_argument("--backend", type=str, default="mock",
-                        choices=["mock", "ollama", "transformers"],
+                        choices=available_backends(),
                         help="Backend to use for chicken brains")
     parser.add_argument("--num_agents", type=int, default=4, help="Number of chickens in the flock")
     parser.add_argument("--ollama-model", type=str, default="gpt-oss-20b", help="Ollama model name")
     parser.add_argument("--hf-model-id", type=str, default=None, help="HF model id (e.g., openmodel/gpt-oss-20b)")
+    parser.add_argument("--api-base", type=str, default=None,
+                        help="Inference server base URL(s), comma-separated for a load-balanced pool")
+    parser.add_argument("--balance", type=str, default="least-outstanding", choices=STRATEGIES,
+                        help="How a multi-URL --api-base spreads requests over its servers")
+    parser.add_argument("--health-interval", type=float, default=None,
+                        help="Seconds between /models health checks of a multi-URL --api-base (off if omitted)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Run seed; episodes, hens and subsystems get derived streams (random if omitted)")
+    parser.add_argument("--price", action="append", default=None,
+                        help="model=in,out USD per 1M prompt/completion tokens, for the usage report (repeatable)")
     parser.add_argument("--verbose", action="store_true", help="Print detailed simulation output")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="Overlap each tick's logging/metrics with the next tick's inference")
+    parser.add_argument("--strict", action="store_true",
+                        help="With --pipelined, finish each tick's writes before the next inference")
+    parser.add_argument("--tick-deadline", type=float, default=None,
+                        help="Seconds per tick before slow agents get a fallback action")
+    parser.add_argument("--carry-late", action="store_true",
+                        help="With --tick-deadline, use late responses on the next tick")
+    parser.add_argument("--hedge-percentile", type=float, default=None,
+                        help="With --tick-deadline, duplicate requests slower than this latency percentile")
 
     args = parser.parse_args()
 
+    # Configure the shared pool the backends will look up by this api_base
+    get_pool(args.api_base, strategy=args.balance, health_interval_s=args.health_interval)
+
+    run_seeds = SeedTree(args.seed)
+    print(f"Run seed: {run_seeds.seed}")
+
     for ep in range(args.episodes):
         print(f"\n=== Episode {ep+1}/{args.episodes} ===")
+        episode = run_seeds.child("episode", ep)
 
         # Build flock
         use_llm = args.backend in ["ollama", "transformers"]
-        flock = build_flock(num_agents=args.num_agents, use_llm=use_llm)
+        flock = build_flock(num_agents=args.num_agents, use_llm=use_llm, rng=episode.rng("flock"))
 
         # Run engine
-        coop = CoopEngine(flock, max_ticks=args.ticks, log_interval=5)
-        coop.run(backend=args.backend, verbose=args.verbose)
+        deadline = None
+        if args.tick_deadline is not None:
+            deadline = TickDeadline(args.tick_deadline, carry_over=args.carry_late,
+                                    hedge_percentile=args.hedge_percentile)
+        coop = CoopEngine(flock, max_ticks=args.ticks, log_interval=5, deadline=deadline, seed=episode.seed,
+                          usage_prices=parse_prices(args.price))
+        coop.run(backend=args.backend, verbose=args.verbose, pipelined=args.pipelined, strict=args.strict,
+                 api_base=args.api_base)
+        coop.close()
+        summary = coop.usage.summary()
+        if summary["requests"]:
+            print(format_report(summary))
 
     print("\nSimulation complete.")
-    print("Logs: data/log.csv")
-    print("Memories: data/memory_snapshots.json")
+    print("Logs: data/coop_log/")
+    print("Memories: data/memories.json")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,94 @@
+# scripts/bench_deadline.py
+
+"""
+Multi-tick check of per-tick deadlines for Clucktocracy.
+Runs a flock bigger than the worker pool whose requests each take a good part
+of the deadline, for several ticks, and fails unless:
+  - TickDeadline's own pool answers every hen on every tick,
+  - with a shared pool too small for the flock, hens that miss the deadline
+    are cancelled rather than left queued, so later ticks answer as many hens
+    as the first instead of drifting into all-fallback,
+  - the same holds for a CoopServer window against a slow stand-in server.
+
+    python scripts/bench_deadline.py --hens 48 --job-s 0.5 --deadline-s 1.0
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_pool import StandIn, check
+from chickens.agent import ChickenAgent
+from gpt.deadlines import TickDeadline
+from gpt.inference import fallback_action
+from simulation.server import CoopServer
+
+
+def slow_action(agent, tick: int, nearby: list, job_s: float) -> dict:
+    time.sleep(job_s)
+    return {"tick": tick, "agent": agent.name, "action": "FORAGE", "target": None,
+            "message": f"{agent.name} answered", "outcome": "stand-in"}
+
+
+def answered_per_tick(deadline: TickDeadline, agents, ticks: int, job_s: float, executor=None) -> list:
+    counts = []
+    for tick in range(ticks):
+        jobs = [partial(slow_action, agent, tick, [], job_s) for agent in agents]
+        acts = deadline.run(jobs, fallback_action, executor=executor)
+        counts.append(sum(a["outcome"] != "fallback" for a in acts))
+    return counts
+
+
+def steady(counts: list) -> bool:
+    """Later ticks answer about as many hens as the first one did."""
+    return counts[0] > 0 and min(counts[1:]) >= 0.9 * counts[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check tick deadlines with more hens than workers")
+    parser.add_argument("--hens", type=int, default=48, help="Hens asking per tick")
+    parser.add_argument("--workers", type=int, default=16, help="Size of the shared worker pool")
+    parser.add_argument("--job-s", type=float, default=0.5, help="Seconds each request takes")
+    parser.add_argument("--deadline-s", type=float, default=1.0, help="Per-tick deadline")
+    parser.add_argument("--ticks", type=int, default=4, help="Ticks to run")
+    args = parser.parse_args()
+
+    agents = [ChickenAgent(f"hen_{i+1}") for i in range(args.hens)]
+    failures: list = []
+
+    deadline = TickDeadline(args.deadline_s, max_workers=args.workers)
+    counts = answered_per_tick(deadline, agents, args.ticks, args.job_s)
+    deadline.shutdown()
+    check(failures, all(n == args.hens for n in counts), f"own pool answers every hen {counts}")
+
+    for carry_over in (False, True):
+        deadline = TickDeadline(args.deadline_s, carry_over=carry_over)
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            counts = answered_per_tick(deadline, agents, args.ticks, args.job_s, executor=executor)
+        check(failures, steady(counts), f"shared pool stays steady, carry_over={carry_over} {counts}")
+
+    import requests  # noqa: F401  (the stand-in is reached through the HTTP backends)
+
+    stand_in = StandIn(["small"], delay_s=args.job_s)
+    data_dir = tempfile.mkdtemp()
+    server = CoopServer(max_workers=args.workers, deadline_s=args.deadline_s, data_dir=data_dir)
+    coop = server.create_coop("stragglers", agents, ticks_per_second=100.0, backend="ollama",
+                              model="small", api_base=stand_in.url, persist=False)
+    for _ in range(args.ticks):
+        server.run_window()
+    answered = Counter(r["tick"] for r in coop.engine.history.rows() if r["outcome"] == "ollama")
+    counts = [answered[tick] for tick in range(args.ticks)]
+    check(failures, coop.error is None and steady(counts), f"server window stays steady {counts}")
+
+    server.executor.shutdown(wait=True)
+    stand_in.close()
+    shutil.rmtree(data_dir, ignore_errors=True)
+    sys.exit(1 if failures else 0)
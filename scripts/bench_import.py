@@ -0,0 +1,63 @@
+# scripts/bench_import.py
+
+"""
+Import-time benchmark for Clucktocracy.
+Imports the engine in a fresh interpreter (as the CLI, HUD and sweep workers
+do) and fails if startup gets slower than a threshold or if heavy inference
+dependencies are pulled in before any LLM backend is used.
+
+    python scripts/bench_import.py --max-ms 300
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Modules that must only load when an LLM backend is actually used
+HEAVY_MODULES = ["transformers", "torch", "requests", "urllib3"]
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+ms = (time.perf_counter() - t0) * 1000
+print(json.dumps({{"ms": ms, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, repeat: int = 5) -> dict:
+    """Best-of-N import time in a fresh interpreter, plus any heavy modules it loaded."""
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        if best is None or result["ms"] < best["ms"]:
+            best = result
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Clucktocracy import time")
+    parser.add_argument("--module", type=str, default="simulation.engine", help="Module to import")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters to try (best is kept)")
+    parser.add_argument("--max-ms", type=float, default=300.0, help="Fail above this import time")
+    args = parser.parse_args()
+
+    result = measure(args.module, args.repeat)
+    print(f"import {args.module}: {result['ms']:.1f} ms (best of {args.repeat})")
+
+    failed = False
+    if result["heavy"]:
+        print(f"FAIL: heavy modules imported eagerly: {', '.join(result['heavy'])}")
+        failed = True
+    if result["ms"] > args.max_ms:
+        print(f"FAIL: import time above {args.max_ms:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
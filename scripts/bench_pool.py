@@ -0,0 +1,134 @@
+# scripts/bench_pool.py
+
+"""
+End-to-end check of endpoint pooling for Clucktocracy.
+Starts three stand-in OpenAI-compatible servers on localhost (a fast one, a
+slower one that also serves the large model, and one that fails every
+request), runs a few ticks of hens against them through the real backends and
+fails unless:
+  - health checks eject the failing server and learn the others' models,
+  - requests are spread over both healthy servers and every hen gets an answer,
+  - the model only one server has goes only to that server,
+  - without health checks, a failing server is ejected after `eject_after`
+    errors and the retry still answers each hen.
+
+    python scripts/bench_pool.py --hens 8 --ticks 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from chickens.agent import ChickenAgent
+from gpt.inference import generate_ai_actions
+from gpt.pool import EndpointPool
+
+REPLY = '{"action": "FORAGE", "target": null, "message": "Cluck from %d"}'
+
+
+class StandIn:
+    """One fake inference server; counts the chat requests it receives per model."""
+
+    def __init__(self, models, delay_s: float = 0.0, fail: bool = False):
+        self.hits: Counter = Counter()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code: int, body: dict):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._send(500 if fail else 200, {"data": [{"id": m} for m in models]})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stand_in.hits[body["model"]] += 1
+                time.sleep(delay_s)
+                if fail:
+                    return self._send(500, {"error": "stand-in failure"})
+                self._send(200, {"choices": [{"message": {"content": REPLY % stand_in.port}}],
+                                 "usage": {"prompt_tokens": 100, "completion_tokens": 12}})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.port = self.server.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run_ticks(pool, agents, ticks: int, model: str, backend: str, executor, session) -> list:
+    actions = []
+    for tick in range(ticks):
+        actions += generate_ai_actions(agents, tick, backend=backend, model=model, api_base=pool,
+                                       api_key="stand-in", executor=executor, session=session)
+    return actions
+
+
+def check(failures: list, ok: bool, what: str):
+    print(f"{'ok  ' if ok else 'FAIL'} {what}")
+    if not ok:
+        failures.append(what)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check endpoint pooling against stand-in servers")
+    parser.add_argument("--hens", type=int, default=8, help="Hens asking per tick")
+    parser.add_argument("--ticks", type=int, default=10, help="Ticks to run")
+    args = parser.parse_args()
+
+    import requests
+
+    fast = StandIn(["small"], delay_s=0.02)
+    slow = StandIn(["small", "large"], delay_s=0.08)
+    broken = StandIn(["small"], fail=True)
+    agents = [ChickenAgent(f"hen_{i+1}") for i in range(args.hens)]
+    session = requests.Session()
+    failures: list = []
+
+    with ThreadPoolExecutor(max_workers=args.hens) as executor:
+        # Health-checked pool: the broken server is ejected before any hen asks
+        pool = EndpointPool([fast.url, slow.url, broken.url])
+        pool.check(session)
+        stats = {s["url"]: s for s in pool.stats()}
+        check(failures, not stats[broken.url]["healthy"], "health check ejects the failing server")
+        check(failures, stats[slow.url]["models"] == ["large", "small"], "health check learns served models")
+
+        acts = run_ticks(pool, agents, args.ticks, "small", "ollama", executor, session)
+        check(failures, all(a["outcome"] == "ollama" for a in acts), "every hen gets a parsed answer")
+        check(failures, fast.hits["small"] > 0 and slow.hits["small"] > 0,
+              f"load spread over healthy servers (fast {fast.hits['small']}, slow {slow.hits['small']})")
+        check(failures, broken.hits["small"] == 0, "no requests reach the ejected server")
+
+        run_ticks(pool, agents, 1, "large", "remote-api", executor, session)
+        check(failures, slow.hits["large"] == args.hens and fast.hits["large"] == 0,
+              "a model served by one server only goes there")
+
+        # No health checks: the broken server is found out by failing requests
+        broken.hits.clear()
+        pool = EndpointPool([fast.url, broken.url], eject_after=3, eject_s=60)
+        acts = run_ticks(pool, agents, args.ticks, "small", "ollama", executor, session)
+        check(failures, all(a["outcome"] == "ollama" for a in acts), "retries answer every hen")
+        check(failures, broken.hits["small"] <= pool.eject_after + args.hens,
+              f"failing server ejected after errors ({broken.hits['small']} requests)")
+
+    for stand_in in (fast, slow, broken):
+        stand_in.close()
+    sys.exit(1 if failures else 0)
@@ -2,71 +2,183 @@
 
 """
 Generate chicken bios for the Clucktocracy simulation.
-Can run in mock mode (random) or using GPT-OSS models via inference.py.
+Can run in mock mode (random) or with any inference backend (ollama,
+transformers, remote-api, ...). Bios are generated concurrently on a bounded
+worker pool, cached by (name, personality, role, model) in bio_cache.jsonl as
+each one finishes, and chicken_bios.json is rewritten as results arrive, so a
+large flock can be bootstrapped quickly and an interrupted run resumes where
+it stopped.
 """
 
 import argparse
-import random
+import importlib.util
 import json
 import os
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from typing import Dict, List
 
-from chickens.agent import ChickenAgent
-from gpt.inference import generate_action
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
+from chickens.agent import ChickenAgent
+from gpt.inference import TEXT_BACKENDS, complete_text
+from gpt.pool import STRATEGIES, get_pool
+from gpt.prompting import PromptBuilder
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
 BIO_PATH = os.path.join(DATA_DIR, "chicken_bios.json")
+CACHE_PATH = os.path.join(DATA_DIR, "bio_cache.jsonl")
+BIO_TEMPLATE = os.path.join(os.path.dirname(__file__), "..", "prompts", "bio_prompt.txt")
 
+PERSONALITIES = ["aggressive", "scheming", "submissive", "zen", "curious"]
+ROLES = ["leader", "follower", "gossip", "watcher"]
+BACKSTORIES = [
+    "Raised near the grain silo, ambitious and bold.",
+    "Once a quiet chick, now seeks influence.",
+    "Prefers peace but won’t back down when challenged.",
+    "Wanders the coop spreading whispers of intrigue.",
+]
 
-def random_bio(name: str) -> dict:
-    personalities = ["aggressive", "scheming", "submissive", "zen", "curious"]
-    roles = ["leader", "follower", "gossip", "watcher"]
 
+class BioPromptBuilder(PromptBuilder):
+    """Bio template as the shared prefix; the per-hen part is just her identity."""
+
+    def __init__(self):
+        super().__init__(template_path=BIO_TEMPLATE)
+
+    def dynamic_part(self, agent, tick: int, nearby=()) -> str:
+        return f"Name: {agent.name}\nPersonality: {agent.personality}\nRole: {agent.role}\nWrite her backstory."
+
+
+def random_bio(name: str) -> dict:
     return {
         "name": name,
-        "personality": random.choice(personalities),
-        "role": random.choice(roles),
-        "backstory": random.choice([
-            "Raised near the grain silo, ambitious and bold.",
-            "Once a quiet chick, now seeks influence.",
-            "Prefers peace but won’t back down when challenged.",
-            "Wanders the coop spreading whispers of intrigue."
-        ])
+        "personality": random.choice(PERSONALITIES),
+        "role": random.choice(ROLES),
+        "backstory": random.choice(BACKSTORIES),
     }
 
 
-def generate_bios(num: int = 4, backend: str = "mock") -> list[dict]:
-    bios = []
-    for i in range(num):
-        name = f"hen_{i+1}"
-        if backend == "mock":
-            bio = random_bio(name)
-        else:
-            # Use GPT backend to invent a backstory
-            context = {"backend": backend}
-            fake_agent = ChickenAgent(name, "scheming", "follower")
-            action = generate_action(fake_agent, context)
-            bio = {
-                "name": name,
-                "personality": random.choice(["aggressive", "scheming", "submissive", "zen"]),
-                "role": random.choice(["leader", "follower", "gossip"]),
-                "backstory": action.get("message", "A mysterious chicken with untold stories.")
-            }
-        bios.append(bio)
-
-    with open(BIO_PATH, "w", encoding="utf-8") as f:
+def plan_flock(num: int, seed: int = 0) -> List[ChickenAgent]:
+    """Names, personalities and roles for `num` hens; the same seed gives the same flock (and cache keys)."""
+    rng = random.Random(seed)
+    return [ChickenAgent(f"hen_{i+1}", rng.choice(PERSONALITIES), rng.choice(ROLES)) for i in range(num)]
+
+
+def cache_key(bio: dict, model: str) -> tuple:
+    return bio["name"], bio["personality"], bio["role"], model
+
+
+def load_cache(path: str = CACHE_PATH) -> Dict[tuple, dict]:
+    cache = {}
+    if not os.path.exists(path):
+        return cache
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from an interrupted run
+            cache[cache_key(entry, entry["model"])] = entry
+    return cache
+
+
+def _write_bios(bios: List[dict], path: str):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
         json.dump(bios, f, indent=2)
+    os.replace(tmp, path)
+
+
+def generate_bios(
+    num: int = 4,
+    backend: str = "mock",
+    model: str = "openai/gpt-oss-20b",
+    api_base: str = None,
+    api_key: str = None,
+    workers: int = 8,
+    seed: int = 0,
+    flush_every: int = 25,
+    bio_path: str = BIO_PATH,
+    cache_path: str = CACHE_PATH,
+) -> List[dict]:
+    """
+    Bios for hen_1..hen_<num>, in name order. Cached bios are reused; the rest
+    are generated `workers` at a time and appended to the cache as they finish.
+    Only real model text is cached: hens whose request failed are left out and
+    retried on the next run.
+    """
+    flock = plan_flock(num, seed)
+    if backend != "mock" and backend not in TEXT_BACKENDS:
+        raise ValueError(f"unknown backend {backend!r}; expected one of: mock, {', '.join(TEXT_BACKENDS)}")
+    if backend == "transformers" and importlib.util.find_spec("transformers") is None:
+        # Fail once here rather than once per hen
+        raise RuntimeError("the transformers backend needs `pip install transformers torch`")
+    if backend == "mock":
+        bios = [dict(random_bio(a.name), personality=a.personality, role=a.role) for a in flock]
+        _write_bios(bios, bio_path)
+        return bios
+
+    cache = load_cache(cache_path)
+    bios: Dict[str, dict] = {}
+    todo = []
+    for agent in flock:
+        hit = cache.get((agent.name, agent.personality, agent.role, model))
+        if hit is not None:
+            bios[agent.name] = hit
+        else:
+            todo.append(agent)
+
+    prompts = BioPromptBuilder()
+    jobs = [partial(complete_text, agent, prompts, backend, model, api_base=api_base, api_key=api_key)
+            for agent in todo]
+
+    def ordered() -> List[dict]:
+        return [bios[a.name] for a in flock if a.name in bios]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool, open(cache_path, "a", encoding="utf-8") as cache_file:
+        futures = {pool.submit(job): agent for job, agent in zip(jobs, todo)}
+        for done, fut in enumerate(as_completed(futures), 1):
+            agent = futures[fut]
+            # Failed requests carry no text and must never end up in the cache
+            result = fut.result()
+            backstory = (result["text"] or "").strip()
+            if not backstory:
+                continue  # not cached, so the next run retries it
+            bio = {"name": agent.name, "personality": agent.personality, "role": agent.role,
+                   "backstory": backstory, "model": model}
+            bios[agent.name] = bio
+            cache_file.write(json.dumps(bio) + "\n")
+            cache_file.flush()
+            if done % flush_every == 0:
+                _write_bios(ordered(), bio_path)
 
-    return bios
+    out = ordered()
+    _write_bios(out, bio_path)
+    return out
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate chicken bios")
     parser.add_argument("--num", type=int, default=4, help="Number of chickens")
-    parser.add_argument("--backend", type=str, default="mock",
-                        choices=["mock", "ollama", "transformers"],
+    parser.add_argument("--backend", type=str, default="mock", choices=["mock", *TEXT_BACKENDS],
                         help="Backend to use for backstory generation")
+    parser.add_argument("--model", type=str, default="openai/gpt-oss-20b", help="Model name")
+    parser.add_argument("--api-base", type=str, default=None, help="Inference server base URL(s)")
+    parser.add_argument("--api-key", type=str, default=None, help="API key for remote-api")
+    parser.add_argument("--balance", type=str, default="least-outstanding", choices=STRATEGIES,
+                        help="How a multi-URL --api-base spreads requests over its servers")
+    parser.add_argument("--health-interval", type=float, default=None,
+                        help="Seconds between /models health checks of a multi-URL --api-base (off if omitted)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent generation requests")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for personalities/roles (keeps cache keys stable)")
     args = parser.parse_args()
 
-    bios = generate_bios(args.num, backend=args.backend)
-    print(f"Generated {len(bios)} bios → {BIO_PATH}")
+    get_pool(args.api_base, strategy=args.balance, health_interval_s=args.health_interval)
+    bios = generate_bios(args.num, backend=args.backend, model=args.model, api_base=args.api_base,
+                         api_key=args.api_key, workers=args.workers, seed=args.seed)
+    print(f"Generated {len(bios)}/{args.num} bios → {BIO_PATH}")
+    if len(bios) < args.num:
+        print(f"{args.num - len(bios)} hens got no backstory; run again to retry them")
@@ -2,51 +2,239 @@
 
 """
 Generate a whimsical "coop constitution scroll" or episode summary.
-Takes data/log.csv and data/memory_snapshots.json and prints a scroll-like output.
+Streams the action log (a segmented data/coop_log directory or a CSV such as
+the old data/log.csv) plus data/memories.json (parsed incrementally, keeping
+only each hen's last few entries) and yields the scroll line by line, so
+memory stays flat however long the run. Action names are canonicalized, so
+old logs read the same as new ones. Filters narrow it to a tick
+range or a few hens; summary mode collapses each hen's events per tick window
+into one line ("PECK×12 → hen_2×9, hen_3×3").
+
+    python scripts/generate_scroll.py --from 1000 --to 2000 --agent hen_1 --summary --window 50
 """
 
-import os
-import csv
+import argparse
 import json
+import os
+import sys
+from collections import Counter, defaultdict, deque
 from textwrap import indent
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from simulation.events import canonical_action
+from simulation.replay import iter_log_rows
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
-LOG_PATH = os.path.join(DATA_DIR, "log.csv")
-MEMORY_PATH = os.path.join(DATA_DIR, "memory_snapshots.json")
-
-
-def generate_scroll():
-    scroll_lines = []
-    scroll_lines.append("=== 🪶 The Coop Scroll of Clucktocracy 🪶 ===\n")
-
-    # Load log
-    if os.path.exists(LOG_PATH):
-        scroll_lines.append(">> Chronicles of Actions:\n")
-        with open(LOG_PATH, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                line = f"[Tick {row['tick']}] {row['agent']} -> {row['action']} ({row['result']})"
-                if row["message"]:
-                    line += f' "{row["message"]}"'
-                scroll_lines.append(indent(line, "  "))
-        scroll_lines.append("")
-
-    # Load memory snapshots
-    if os.path.exists(MEMORY_PATH):
-        scroll_lines.append(">> Memories of the Flock:\n")
-        with open(MEMORY_PATH, encoding="utf-8") as f:
-            memories = json.load(f)
-        for agent, mems in memories.items():
-            scroll_lines.append(f"{agent}:")
-            for m in mems[-3:]:  # last 3 memories
-                scroll_lines.append(indent(f"- {m.get('event','')}", "  "))
-        scroll_lines.append("")
-
-    return "\n".join(scroll_lines)
+LOG_DIR = os.path.join(DATA_DIR, "coop_log")
+LEGACY_LOG_PATH = os.path.join(DATA_DIR, "log.csv")
+MEMORY_PATH = os.path.join(DATA_DIR, "memories.json")
+
+
+def default_source() -> str:
+    return LOG_DIR if os.path.isdir(LOG_DIR) else LEGACY_LOG_PATH
+
+
+def _filtered(rows: Iterable[dict], agents: Optional[set]) -> Iterator[dict]:
+    """Rows involving `agents` (all if None), with legacy action names canonicalized."""
+    for row in rows:
+        if agents is None or row["agent"] in agents or row["target"] in agents:
+            row["action"] = canonical_action(row["action"])
+            yield row
+
+
+def chronicle_lines(rows: Iterable[dict]) -> Iterator[str]:
+    """One line per event."""
+    for row in rows:
+        line = f"[Tick {row['tick']}] {row['agent']} -> {row['action']}"
+        if row["target"]:
+            line += f" {row['target']}"
+        if row["outcome"]:
+            line += f" ({row['outcome']})"
+        if row["message"]:
+            line += f' "{row["message"]}"'
+        yield line
+
+
+def _summary_line(agent: str, lo: int, hi: int, actions: Counter, targets: Dict[str, Counter]) -> str:
+    parts = []
+    for action, n in actions.most_common():
+        part = f"{action}×{n}" if n > 1 else action
+        if targets[action]:
+            hens = ", ".join(f"{t}×{c}" if c > 1 else t for t, c in targets[action].most_common(3))
+            more = len(targets[action]) - 3
+            part += f" → {hens}" + (f" +{more} more" if more > 0 else "")
+        parts.append(part)
+    ticks = f"Tick {lo}" if lo == hi else f"Ticks {lo}–{hi}"
+    return f"[{ticks}] {agent}: " + "; ".join(parts)
+
+
+def summary_lines(rows: Iterable[dict], window: int = 10) -> Iterator[str]:
+    """
+    One line per hen per `window` ticks, with action counts and top targets.
+    Only the current window is held in memory (ticks arrive in order).
+    """
+    current = None
+    actions: Dict[str, Counter] = defaultdict(Counter)
+    targets: Dict[str, Dict[str, Counter]] = defaultdict(lambda: defaultdict(Counter))
+    last_tick = None
+
+    def flush():
+        lo = current * window
+        hi = min(lo + window - 1, last_tick)
+        for agent in sorted(actions):
+            yield _summary_line(agent, lo, hi, actions[agent], targets[agent])
+
+    for row in rows:
+        bucket = row["tick"] // window
+        if current is not None and bucket != current:
+            yield from flush()
+            actions.clear()
+            targets.clear()
+        current, last_tick = bucket, row["tick"]
+        actions[row["agent"]][row["action"]] += 1
+        if row["target"]:
+            targets[row["agent"]][row["action"]][row["target"]] += 1
+    if current is not None:
+        yield from flush()
+
+
+class _JsonStream:
+    """Pull-parser over a JSON file, decoding one value at a time from a rolling buffer."""
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, f, chunk_size: int = 1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+
+    def _fill(self) -> bool:
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at end of file)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def take(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos} of the buffer")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            self.pos = end
+            return value
+
+
+def iter_memory_tails(memory_path: str, last: int = 3) -> Iterator[Tuple[str, List[dict]]]:
+    """(hen, her last `last` memories) from memories.json, one hen's tail in memory at a time."""
+    with open(memory_path, encoding="utf-8") as f:
+        stream = _JsonStream(f)
+        stream.take("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            agent = stream.value()
+            stream.take(":")
+            stream.take("[")
+            tail: deque = deque(maxlen=last)
+            if stream.peek() != "]":
+                while True:
+                    tail.append(stream.value())
+                    if stream.peek() != ",":
+                        break
+                    stream.take(",")
+            stream.take("]")
+            yield agent, list(tail)
+            if stream.peek() != ",":
+                break
+            stream.take(",")
+
+
+def memory_lines(memory_path: str = MEMORY_PATH, agents: Optional[set] = None, last: int = 3) -> Iterator[str]:
+    if not os.path.exists(memory_path):
+        return
+    for agent, mems in iter_memory_tails(memory_path, last):
+        if agents is not None and agent not in agents:
+            continue
+        yield f"{agent}:"
+        for m in mems:
+            yield indent(f"- {m.get('event','')}", "  ")
+
+
+def iter_scroll(
+    source: str = None,
+    memory_path: str = MEMORY_PATH,
+    tick_from: Optional[int] = None,
+    tick_to: Optional[int] = None,
+    agents: Optional[Sequence[str]] = None,
+    summary: bool = False,
+    window: int = 10,
+) -> Iterator[str]:
+    """Yield the scroll lazily. `agents` keeps events a hen performed or was targeted by."""
+    source = source or default_source()
+    wanted = set(agents) if agents else None
+
+    yield "=== 🪶 The Coop Scroll of Clucktocracy 🪶 ===\n"
+
+    if os.path.exists(source):
+        yield ">> Chronicles of Actions:\n"
+        rows = _filtered(iter_log_rows(source, tick_from, tick_to), wanted)
+        lines = summary_lines(rows, window) if summary else chronicle_lines(rows)
+        for line in lines:
+            yield indent(line, "  ")
+        yield ""
+
+    mems = memory_lines(memory_path, wanted)
+    first = next(mems, None)
+    if first is not None:
+        yield ">> Memories of the Flock:\n"
+        yield first
+        yield from mems
+        yield ""
+
+
+def generate_scroll(**kwargs) -> str:
+    """Whole scroll as one string (fine for short runs; use iter_scroll for long ones)."""
+    return "\n".join(iter_scroll(**kwargs))
 
 
 if __name__ == "__main__":
-    scroll = generate_scroll()
-    print(scroll)
+    parser = argparse.ArgumentParser(description="Print the coop scroll for a run")
+    parser.add_argument("--source", type=str, default=None, help="Segmented log dir or CSV log")
+    parser.add_argument("--memories", type=str, default=MEMORY_PATH, help="Memories JSON file")
+    parser.add_argument("--from", dest="tick_from", type=int, default=None, help="First tick")
+    parser.add_argument("--to", dest="tick_to", type=int, default=None, help="Last tick")
+    parser.add_argument("--agent", action="append", default=None, help="Only this hen (repeatable)")
+    parser.add_argument("--summary", action="store_true", help="Collapse events per hen per tick window")
+    parser.add_argument("--window", type=int, default=10, help="Ticks per summary window")
+    args = parser.parse_args()
 
+    try:
+        for line in iter_scroll(args.source, args.memories, args.tick_from, args.tick_to, args.agent,
+                                summary=args.summary, window=args.window):
+            print(line)
+    except BrokenPipeError:
+        # Reader went away (e.g. piped into `head`); don't dump a traceback on exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
@@ -0,0 +1,138 @@
+# simulation/autoplay.py
+"""
+Background auto-play for CoopEngine.
+A worker thread advances the engine at a target tick rate and publishes
+read-only snapshots to a thread-safe queue, so a UI can poll the latest
+state on a timer without ever blocking on inference.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Actions drawn as edges on the coop graph
+EDGE_ACTIONS = ("ALLY", "SANCTION", "GOSSIP", "PECK")
+
+
+def next_tick(engine) -> int:
+    """Tick number for the engine's next step (0 before anything has happened)."""
+    return engine.tick + 1 if len(engine.history) else 0
+
+
+def snapshot(engine, feed_size: int = 60, scenario: dict = None) -> Dict[str, Any]:
+    """Plain-data copy of what the HUD shows; safe to hand to another thread."""
+    events = engine.history
+    status = ""
+    if scenario and len(events):
+        from chickens.scenarios import check_scenario
+        status = check_scenario(scenario, events)
+    return {
+        "tick": engine.tick,
+        "n_events": len(events),
+        "feed": events.tail(feed_size),
+        "edges": events.edges(EDGE_ACTIONS),
+        "metrics": engine.compute_metrics(),
+        "peck_counts": events.counts_by_agent("PECK"),
+        "positions": dict(engine.grid.positions),
+        "memories": {a.name: list(a.memory)[-3:] for a in engine.agents},
+        "scenario_status": status,
+        "usage": engine.usage.summary(top=3),
+        "published_at": time.time(),
+    }
+
+
+class AutoPlayer:
+    def __init__(self, engine, ticks_per_second: float = 1.0, step_kwargs: Dict[str, Any] = None,
+                 scenario: dict = None, queue_size: int = 4):
+        self.engine = engine
+        self.ticks_per_second = ticks_per_second
+        self.step_kwargs = step_kwargs or {}
+        self.scenario = scenario
+        # Held for every engine mutation or read, by this thread and the UI alike
+        self.lock = threading.RLock()
+        self.snapshots: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=queue_size)
+        self.error: Optional[BaseException] = None
+        self._latest: Optional[Dict[str, Any]] = None
+        self._pending_human: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running and not self._stop.is_set():
+            return
+        # Fresh event per worker: one still finishing its tick after stop() keeps
+        # its own (set) event and exits, so a quick restart never revives it.
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, args=(self._stop,), name="coop-autoplay",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 0.0):
+        """
+        Ask the worker to stop after its current tick. Returns at once by default
+        (safe from a UI thread while a slow tick is in flight); waits up to
+        `timeout` seconds, or until the worker exits if None.
+        """
+        self._stop.set()
+        if self._thread is not None and timeout != 0:
+            self._thread.join(timeout)
+
+    def submit(self, human_override: Dict[str, Any]):
+        """Queue a human action for the next auto-played tick (latest submission wins)."""
+        with self.lock:
+            self._pending_human = human_override
+
+    def step_now(self, **kwargs) -> list:
+        """Advance one tick immediately (manual "Next Tick"), serialized with the worker."""
+        with self.lock:
+            out = self.engine.step(tick=next_tick(self.engine), **{**self.step_kwargs, **kwargs})
+            self._publish(snapshot(self.engine, scenario=self.scenario))
+        return out
+
+    def latest(self) -> Dict[str, Any]:
+        """Most recent snapshot; drains the queue so readers never fall behind."""
+        while True:
+            try:
+                self._latest = self.snapshots.get_nowait()
+            except queue.Empty:
+                break
+        if self._latest is None:
+            with self.lock:
+                self._latest = snapshot(self.engine, scenario=self.scenario)
+        return self._latest
+
+    # ------------------------------------------------------------------
+    def _publish(self, snap: Dict[str, Any]):
+        # Drop the oldest snapshot rather than block the simulation
+        while True:
+            try:
+                self.snapshots.put_nowait(snap)
+                return
+            except queue.Full:
+                try:
+                    self.snapshots.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _loop(self, stop: threading.Event):
+        interval = 1.0 / max(self.ticks_per_second, 1e-6)
+        while not stop.is_set():
+            started = time.perf_counter()
+            with self.lock:
+                if next_tick(self.engine) >= self.engine.max_ticks:
+                    break
+                human, self._pending_human = self._pending_human, None
+                try:
+                    self.engine.step(tick=next_tick(self.engine), human_override=human, **self.step_kwargs)
+                except Exception as e:  # surface to the UI instead of dying silently
+                    self.error = e
+                    break
+                snap = snapshot(self.engine, scenario=self.scenario)
+            self._publish(snap)
+            stop.wait(max(0.0, interval - (time.perf_counter() - started)))
@@ -5,35 +5,125 @@ Manages agents, tick loop, history, metrics, and calls GPT inference backends.
 """
 
 import os
-import csv
 import json
+import math
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 
 from chickens.agent import ChickenAgent
+from gpt.deadlines import TickDeadline
 from gpt.inference import generate_ai_actions
+from gpt.prompting import PromptBuilder
+from gpt.routing import TierRouter, route_ai_actions
+from gpt.usage import USAGE_FILE, UsageLedger
+from simulation.events import EventStore, canonical_action
+from simulation.logstore import SegmentedLog
+from simulation.rng import SeedTree, derive_seed
+from simulation.spatial import SpatialGrid
 
 # Paths for logging + memories
-LOG_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "coop_log.csv")
+LOG_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "coop_log")
 MEM_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "memories.json")
 
+# Actions that move a hen around the yard instead of targeting another hen
+MOVE_ACTIONS = ("FORAGE", "SCRATCH", "WANDER")
+
+# Default yard: at least 10x10, growing with the flock to keep ~0.08 hens per unit²
+MIN_YARD_SIZE = 10.0
+HEN_DENSITY = 0.08
+
 
 class CoopEngine:
-    def __init__(self, agents: List[ChickenAgent], max_ticks: int = 200, log_interval: int = 5):
+    def __init__(
+        self,
+        agents: List[ChickenAgent],
+        max_ticks: int = 200,
+        log_interval: int = 5,
+        yard_size: float = None,
+        interaction_radius: float = 3.0,
+        move_step: float = 1.0,
+        memory_tokens: int = 256,
+        router: TierRouter = None,
+        log_segment_ticks: int = 100,
+        log_max_segments: int = None,
+        log_retain_ticks: int = None,
+        data_dir: str = None,
+        persist: bool = True,
+        hot_ticks: int = None,
+        deadline: TickDeadline = None,
+        seed: int = None,
+        usage_prices: dict = None,
+        hen_density: float = HEN_DENSITY,
+    ):
         self.agents = agents
-        self.history: List[Dict[str, Any]] = []
         self.metrics_history: List[Dict[str, Any]] = []
         self.tick = 0
         self.max_ticks = max_ticks
         self.log_interval = log_interval
 
-        # Reset files
-        os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
-        with open(LOG_PATH, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=["tick", "agent", "action", "target", "message", "outcome"])
-            writer.writeheader()
+        # Episode seed: every hen and subsystem draws from its own derived stream,
+        # so a seeded run is reproducible however its inference is scheduled.
+        self.seeds = SeedTree(seed)
+        self.seed = self.seeds.seed
+        for a in agents:
+            self._seed_agent(a)
+
+        # Hen positions; cells match the interaction radius so a neighbor
+        # query only visits the 3x3 block of cells around a hen. Unless yard_size
+        # is fixed, the yard grows with the flock at `hen_density`, so each hen
+        # keeps a roughly constant number of neighbors however large the coop.
+        self.interaction_radius = interaction_radius
+        self.move_step = move_step
+        self.hen_density = None if yard_size is not None else hen_density
+        yard_size = yard_size if yard_size is not None else self._yard_for(len(agents))
+        self.grid = SpatialGrid(yard_size, yard_size, cell_size=interaction_radius)
+        for a in agents:
+            self.grid.scatter([a.name], rng=self.seeds.rng("place", a.name))
 
-        with open(MEM_PATH, "w", encoding="utf-8") as f:
-            json.dump({}, f)
+        # Template compiled once; per-agent memory blocks cached between ticks
+        self.prompts = PromptBuilder(memory_tokens=memory_tokens)
+        self._by_name = {a.name: a for a in agents}
+
+        # Optional per-hen model tiers; without one every hen uses step()'s backend
+        self.router = router
+        # Optional per-tick inference deadline (fallback actions for stragglers)
+        self.deadline = deadline
+        # Tokens, requests, latency and cost per hen/model/tick (model -> USD per 1M in/out tokens)
+        self.usage = UsageLedger(prices=usage_prices)
+        if deadline is not None and deadline.ledger is None:
+            deadline.ledger = self.usage  # bills answers the deadline discards
+
+        # Reset files; the action log is written as compressed tick segments.
+        # data_dir gives each engine its own files when several share a process;
+        # persist=False (e.g. replay) keeps everything in memory.
+        self.persist = persist
+        self.log_dir = os.path.join(data_dir, "coop_log") if data_dir else LOG_DIR
+        self.mem_path = os.path.join(data_dir, "memories.json") if data_dir else MEM_PATH
+        self.log = None
+        if persist:
+            self.log = SegmentedLog(
+                self.log_dir,
+                segment_ticks=log_segment_ticks,
+                max_segments=log_max_segments,
+                retain_ticks=log_retain_ticks,
+                reset=True,
+            )
+            with open(self.mem_path, "w", encoding="utf-8") as f:
+                json.dump({}, f)
+        elif hot_ticks:
+            # Nothing persisted, but bounded history still needs somewhere to spill
+            self.log = SegmentedLog(tempfile.mkdtemp(prefix="coop_spill_"), segment_ticks=log_segment_ticks)
+
+        # Retention: with hot_ticks, only the last K ticks of events and metrics stay
+        # in RAM. Older events are read back from the segment log (so log retention
+        # also bounds what spilled queries can see); older metrics go to metrics.jsonl.
+        self.hot_ticks = hot_ticks
+        self.history = EventStore(hot_ticks=hot_ticks, backing=self.log)
+        if hot_ticks:
+            self.metrics_history = deque(maxlen=hot_ticks)
 
     # ------------------------------------------------------------------
     def step(
@@ -47,15 +137,104 @@ class CoopEngine:
         tick: int = 0,
         constitution: dict = None,
         human_override: dict = None,
+        ai_actions: List[Dict[str, Any]] = None,
+        infer_wall_s: float = None,
     ) -> List[Dict[str, Any]]:
         """
         Advance one tick of the coop simulation.
         - actions: optional list of human or scripted actions
         - backend/model/reasoning/api_base/api_key: inference config
+          (with a router, backend/model come from each hen's tier)
         - human_override: dict with one manual action
+        - ai_actions: precomputed AI moves (e.g. from a CoopServer batch); skips inference
+        - infer_wall_s: wall time it took to compute ai_actions, for usage accounting
         """
-        if actions is None:
-            actions = []
+        all_actions = self._infer(
+            tick,
+            actions=actions,
+            backend=backend,
+            model=model,
+            reasoning_effort=reasoning_effort,
+            api_base=api_base,
+            api_key=api_key,
+            human_override=human_override,
+            ai_actions=ai_actions,
+            infer_wall_s=infer_wall_s,
+        )
+        self._commit(all_actions, tick)
+        self._write_behind(all_actions, tick)
+        return all_actions
+
+    def run(
+        self,
+        backend: str = "mock",
+        verbose: bool = False,
+        pipelined: bool = False,
+        strict: bool = False,
+        **inference,
+    ) -> List[Dict[str, Any]]:
+        """
+        Step from the next tick up to max_ticks; returns the metrics of every tick run.
+
+        Each tick has three stages: inference (reads memories, positions and
+        history), commit (applies the actions in memory) and write-behind
+        (metrics snapshot, log segment, memories file).
+        With `pipelined`, tick t's write-behind runs on a background thread while
+        tick t+1's inference is in flight. Agents observe exactly what a serial
+        run shows them: commits happen in order on this thread, and each waits
+        for the previous write-behind, so metrics are computed on the tick they
+        belong to. Only metrics_history and the files on disk may trail by one
+        tick (so hot_ticks never evicts unwritten rows). `strict` also waits for
+        each write-behind before the next inference starts.
+        """
+
+        from simulation.autoplay import next_tick
+
+        start = next_tick(self)
+        results: List[Dict[str, Any]] = []
+
+        def report(metrics: Dict[str, Any]):
+            results.append(metrics)
+            if verbose and metrics["tick"] % self.log_interval == 0:
+                print(f"[tick {metrics['tick']}] {metrics}")
+
+        if not pipelined:
+            for tick in range(start, self.max_ticks):
+                self.step(backend=backend, tick=tick, **inference)
+                report(self.metrics_history[-1])
+            return results
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="coop-writeback") as writer:
+            pending = None
+            for tick in range(start, self.max_ticks):
+                if strict and pending is not None:
+                    report(pending.result())
+                    pending = None
+                all_actions = self._infer(tick, backend=backend, **inference)
+                if pending is not None:
+                    report(pending.result())
+                self._commit(all_actions, tick)
+                pending = writer.submit(self._write_behind, all_actions, tick)
+            if pending is not None:
+                report(pending.result())
+        return results
+
+    # ------------------------------------------------------------------
+    def _infer(
+        self,
+        tick: int,
+        actions: List[Dict[str, Any]] = None,
+        backend: str = "mock",
+        model: str = "openai/gpt-oss-20b",
+        reasoning_effort: str = "medium",
+        api_base: str = None,
+        api_key: str = None,
+        human_override: dict = None,
+        ai_actions: List[Dict[str, Any]] = None,
+        infer_wall_s: float = None,
+    ) -> List[Dict[str, Any]]:
+        """Stage 1: collect this tick's human, scripted and AI actions (reads state only)."""
+        actions = list(actions or [])
 
         # Add explicit human action override
         if human_override and human_override.get("action") != "IDLE":
@@ -68,56 +247,169 @@ class CoopEngine:
                 "outcome": "submitted",
             })
 
-        # Call GPT inference to get AI moves
-        ai_actions = generate_ai_actions(
-            self.agents,
-            tick=tick,
-            backend=backend,
-            model=model,
-            reasoning_effort=reasoning_effort,
-            api_base=api_base,
-            api_key=api_key,
-        )
+        # Call GPT inference to get AI moves (unless they were computed elsewhere)
+        inferred = ai_actions is None
+        started = time.perf_counter()
+        if ai_actions is None and self.router is not None:
+            ai_actions = route_ai_actions(
+                self.router,
+                self.agents,
+                tick=tick,
+                events=self.history,
+                prompts=self.prompts,
+                api_base=api_base,
+                api_key=api_key,
+                reasoning_effort=reasoning_effort,
+                grid=self.grid,
+                radius=self.interaction_radius,
+                deadline=self.deadline,
+            )
+        elif ai_actions is None:
+            ai_actions = generate_ai_actions(
+                self.agents,
+                tick=tick,
+                backend=backend,
+                model=model,
+                reasoning_effort=reasoning_effort,
+                api_base=api_base,
+                api_key=api_key,
+                grid=self.grid,
+                radius=self.interaction_radius,
+                prompts=self.prompts,
+                deadline=self.deadline,
+            )
+
+        wall_s = time.perf_counter() - started if inferred else infer_wall_s
+        self.usage.record_actions(ai_actions, tick, wall_s=wall_s)
 
-        # Merge human + AI
+        # Merge human + AI, normalizing action spellings
         all_actions = actions + ai_actions
+        for act in all_actions:
+            act["action"] = canonical_action(act.get("action"))
+        return all_actions
+
+    def _commit(self, all_actions: List[Dict[str, Any]], tick: int):
+        """Stage 2: apply a tick's actions to the in-memory state agents observe."""
+        self._apply_movement(all_actions)
+        self._remember(all_actions)
 
         # Save into history
         self.history.extend(all_actions)
         self.tick = tick
 
-        # Append metrics snapshot
+    def _write_behind(self, all_actions: List[Dict[str, Any]], tick: int) -> Dict[str, Any]:
+        """Stage 3: metrics snapshot and persistence for a committed tick."""
         metrics = self.compute_metrics()
         metrics["tick"] = tick
         self.metrics_history.append(metrics)
+        usage_rows = self.usage.take_tick(tick)
+
+        if self.log is not None:
+            self._persist(all_actions, metrics, usage_rows)
+        return metrics
 
-        # Write to log CSV
-        with open(LOG_PATH, "a", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=["tick", "agent", "action", "target", "message", "outcome"])
-            for row in all_actions:
-                writer.writerow(row)
+    def _persist(self, all_actions: List[Dict[str, Any]], metrics: Dict[str, Any],
+                 usage_rows: List[Dict[str, Any]] = ()):
+        """Write one tick to disk."""
+        # Append to the segmented action log
+        self.log.append(all_actions)
+        if self.hot_ticks:
+            with open(os.path.join(self.log.path, "metrics.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(metrics) + "\n")
+        if not self.persist:
+            return
 
-        # Update memories
+        # Inference usage rows (report with `python -m gpt.usage <log dir>`)
+        if usage_rows:
+            with open(os.path.join(self.log.path, USAGE_FILE), "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(row) + "\n" for row in usage_rows)
+
+        # Update memories (bounded runs keep only each hen's recent entries)
         mems = self._load_memories()
         for act in all_actions:
             mems.setdefault(act["agent"], []).append({
                 "tick": act["tick"],
                 "event": f"{act['agent']} did {act['action']} → {act.get('message','')}"
             })
-        with open(MEM_PATH, "w", encoding="utf-8") as f:
+        if self.hot_ticks:
+            mems = {name: entries[-self.hot_ticks:] for name, entries in mems.items()}
+        with open(self.mem_path, "w", encoding="utf-8") as f:
             json.dump(mems, f, indent=2)
 
-        return all_actions
+    def metrics_between(self, tick_from: int = None, tick_to: int = None) -> List[Dict[str, Any]]:
+        """Metric snapshots for a tick range, reading spilled ones from disk when needed."""
+        lo = float("-inf") if tick_from is None else tick_from
+        hi = float("inf") if tick_to is None else tick_to
+        hot = [m for m in self.metrics_history if lo <= m["tick"] <= hi]
+        oldest_hot = self.metrics_history[0]["tick"] if self.metrics_history else None
+        if not self.hot_ticks or oldest_hot is None or lo >= oldest_hot:
+            return hot
+        older = []
+        with open(os.path.join(self.log.path, "metrics.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                m = json.loads(line)
+                if m["tick"] >= oldest_hot or m["tick"] > hi:
+                    break
+                if m["tick"] >= lo:
+                    older.append(m)
+        return older + hot
+
+    # ------------------------------------------------------------------
+    def add_agent(self, agent: ChickenAgent):
+        """Join a hen to the coop mid-run at a random spot in the yard."""
+        self._seed_agent(agent)
+        self.agents.append(agent)
+        self._by_name[agent.name] = agent
+        if self.hen_density is not None:
+            size = self._yard_for(len(self.agents))
+            if size > self.grid.width:
+                self.grid.resize(size, size)
+        self.grid.scatter([agent.name], rng=self.seeds.rng("place", agent.name))
+
+    def _yard_for(self, n: int) -> float:
+        """Side of a square yard holding `n` hens at the target density."""
+        return max(MIN_YARD_SIZE, math.sqrt(n / self.hen_density))
+
+    def _seed_agent(self, agent: ChickenAgent):
+        if agent.seed is None:
+            agent.seed = derive_seed(self.seed, "agent", agent.name)
+
+    def neighbors(self, name: str) -> List[str]:
+        """Hens within interaction range of `name`."""
+        return self.grid.neighbors(name, self.interaction_radius)
+
+    def _remember(self, actions: List[Dict[str, Any]]):
+        """Feed each event into the memory of its actor and (if a hen) its target."""
+        for act in actions:
+            target = act.get("target")
+            event = f"tick {act['tick']}: {act['agent']} {act['action']}"
+            if target:
+                event += f" {target}"
+            if act.get("message"):
+                event += f" — {act['message'][:160]}"
+            for name in (act["agent"], target):
+                agent = self._by_name.get(name)
+                if agent is not None:
+                    agent.remember(event)
+
+    def _apply_movement(self, actions: List[Dict[str, Any]]):
+        """Foraging, scratching and wandering hens drift around the yard."""
+        for act in actions:
+            name = act["agent"]
+            if name not in self.grid.positions:
+                continue
+            if act["action"] in MOVE_ACTIONS:
+                self.grid.wander(name, step=self.move_step, rng=self.seeds.rng("move", name, act["tick"]))
 
     # ------------------------------------------------------------------
     def compute_metrics(self) -> Dict[str, Any]:
         """Compute coop-level indicators."""
-        pecks = sum(1 for h in self.history if h["action"].lower() in ("peck", "initiate_fight"))
-        rumors = sum(1 for h in self.history if h["action"].lower() in ("gossip", "spread_rumor"))
-        sanctions = sum(1 for h in self.history if h["action"].lower() == "sanction")
-        props = sum(1 for h in self.history if h["action"].lower() == "propose")
-        votes = sum(1 for h in self.history if h["action"].lower() == "vote")
-        allies = sum(1 for h in self.history if h["action"].lower() == "ally")
+        pecks = self.history.count("PECK")
+        rumors = self.history.count("GOSSIP")
+        sanctions = self.history.count("SANCTION")
+        props = self.history.count("PROPOSE")
+        votes = self.history.count("VOTE")
+        allies = self.history.count("ALLY")
 
         return {
             "hierarchy_steepness": round(pecks / max(1, len(self.history)), 3),
@@ -132,8 +424,15 @@ class CoopEngine:
         """Optionally persist engine state (stub)."""
         pass
 
+    def close(self):
+        """Finish the run: compress the open log segment."""
+        if self.log is not None:
+            self.log.close()
+        if self.deadline is not None:
+            self.deadline.shutdown()
+
     def _load_memories(self) -> Dict[str, Any]:
-        if not os.path.exists(MEM_PATH):
+        if not os.path.exists(self.mem_path):
             return {}
-        with open(MEM_PATH, encoding="utf-8") as f:
+        with open(self.mem_path, encoding="utf-8") as f:
             return json.load(f)
@@ -0,0 +1,344 @@
+# simulation/events.py
+"""
+Columnar event store for coop history.
+Agents, targets and actions are interned to integer codes and kept in typed
+arrays; per-agent, per-action and per-target row indexes plus running counts
+let metrics, scenarios, the HUD and memory retrieval query without rescanning
+the whole history.
+
+With `hot_ticks` set, only the most recent ticks stay in memory. Older rows are
+dropped from the columns (they already live in the on-disk `backing` log, e.g.
+a SegmentedLog) while the running counts keep covering the whole run, so
+metrics stay exact. Row queries that reach into the spilled range read it back
+from the backing log transparently.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+# Canonical action vocabulary (matches prompts/chicken_prompt.txt plus WANDER)
+CANONICAL_ACTIONS = (
+    "PECK", "ALLY", "GOSSIP", "AUDIT", "PROPOSE", "VOTE",
+    "SANCTION", "FORAGE", "SCRATCH", "IDLE", "WANDER",
+)
+
+# Legacy / backend spellings -> canonical action
+ACTION_ALIASES = {
+    "initiate_fight": "PECK",
+    "spread_rumor": "GOSSIP",
+    "rumor": "GOSSIP",
+}
+
+FIELDS = ["tick", "agent", "action", "target", "message", "outcome"]
+
+Actions = Union[str, Sequence[str], None]
+
+
+def canonical_action(name: Optional[str]) -> str:
+    """Map any action spelling (`peck`, `initiate_fight`, `PECK`) to the canonical upper-case name."""
+    if not name:
+        return "IDLE"
+    name = str(name).strip()
+    return ACTION_ALIASES.get(name.lower(), name.upper())
+
+
+def _action_names(action: Actions) -> Optional[set]:
+    if action is None:
+        return None
+    return {canonical_action(a) for a in ([action] if isinstance(action, str) else action)}
+
+
+class EventStore:
+    def __init__(self, rows: Iterable[Dict[str, Any]] = (), hot_ticks: Optional[int] = None, backing=None):
+        # Vocabularies; code -1 in the target column means "no target"
+        self.agent_names: List[str] = []
+        self.action_names: List[str] = []
+        self._agent_codes: Dict[str, int] = {}
+        self._action_codes: Dict[str, int] = {}
+        for a in CANONICAL_ACTIONS:
+            self._intern_action(a)
+
+        # Columns (hot rows only); row ids are global, column index = rid - _base
+        self._tick = array("l")
+        self._agent = array("l")
+        self._action = array("l")
+        self._target = array("l")
+        self._message: List[str] = []
+        self._outcome: List[str] = []
+        self._base = 0
+        self._total = 0
+
+        # Indexes (row ids, ascending) and running counts over the whole run
+        self._by_agent: Dict[int, array] = defaultdict(lambda: array("l"))
+        self._by_action: Dict[int, array] = defaultdict(lambda: array("l"))
+        self._by_target: Dict[int, array] = defaultdict(lambda: array("l"))
+        self._action_counts: Dict[int, int] = defaultdict(int)
+        self._agent_action_counts: Dict[tuple, int] = defaultdict(int)
+        self._edges: set = set()  # distinct (agent, target, action) codes, never evicted
+        self._ticks_sorted = True
+
+        # Retention: keep `hot_ticks` ticks in memory, older rows are read from `backing`
+        self.hot_ticks = hot_ticks
+        self.backing = backing
+        self.spilled_through: Optional[int] = None  # last tick no longer held in memory
+
+        self.extend(rows)
+
+    # ------------------------------------------------------------------
+    def _intern_agent(self, name: str) -> int:
+        code = self._agent_codes.get(name)
+        if code is None:
+            code = len(self.agent_names)
+            self._agent_codes[name] = code
+            self.agent_names.append(name)
+        return code
+
+    def _intern_action(self, name: str) -> int:
+        code = self._action_codes.get(name)
+        if code is None:
+            code = len(self.action_names)
+            self._action_codes[name] = code
+            self.action_names.append(name)
+        return code
+
+    def _action_code_set(self, action: Actions) -> Optional[set]:
+        names = _action_names(action)
+        if names is None:
+            return None
+        return {self._action_codes[n] for n in names if n in self._action_codes}
+
+    # ------------------------------------------------------------------
+    def append(self, row: Dict[str, Any]) -> int:
+        """Add one event; returns its row id. The action is canonicalized."""
+        rid = self._total
+        tick = int(row.get("tick") or 0)
+        if self._tick and tick < self._tick[-1]:
+            self._ticks_sorted = False
+        agent = self._intern_agent(row["agent"])
+        action = self._intern_action(canonical_action(row.get("action")))
+        target = self._intern_agent(row["target"]) if row.get("target") else -1
+
+        self._tick.append(tick)
+        self._agent.append(agent)
+        self._action.append(action)
+        self._target.append(target)
+        self._message.append(row.get("message") or "")
+        self._outcome.append(row.get("outcome") or row.get("result") or "")
+        self._total += 1
+
+        self._by_agent[agent].append(rid)
+        self._by_action[action].append(rid)
+        if target >= 0:
+            self._by_target[target].append(rid)
+            self._edges.add((agent, target, action))
+        self._action_counts[action] += 1
+        self._agent_action_counts[(agent, action)] += 1
+        return rid
+
+    def extend(self, rows: Iterable[Dict[str, Any]]):
+        for row in rows:
+            self.append(row)
+        self._evict()
+
+    def _evict(self):
+        """Drop rows older than the hot window (in chunks, so the cost is amortized)."""
+        if not self.hot_ticks or not self._tick or not self._ticks_sorted:
+            return
+        cutoff = self._tick[-1] - self.hot_ticks + 1
+        if self._tick[0] >= cutoff - max(1, self.hot_ticks // 4):
+            return
+        k = bisect_left(self._tick, cutoff)
+        for col in (self._tick, self._agent, self._action, self._target, self._message, self._outcome):
+            del col[:k]
+        self._base += k
+        self.spilled_through = cutoff - 1
+        for index in (self._by_agent, self._by_action, self._by_target):
+            for ids in index.values():
+                del ids[:bisect_left(ids, self._base)]
+
+    def row(self, rid: int) -> Dict[str, Any]:
+        i = rid - self._base
+        if i < 0:
+            raise IndexError(f"row {rid} was spilled to disk; query it with rows()")
+        target = self._target[i]
+        return {
+            "tick": self._tick[i],
+            "agent": self.agent_names[self._agent[i]],
+            "action": self.action_names[self._action[i]],
+            "target": self.agent_names[target] if target >= 0 else None,
+            "message": self._message[i],
+            "outcome": self._outcome[i],
+        }
+
+    def __len__(self) -> int:
+        """Total events over the whole run, including spilled ones."""
+        return self._total
+
+    @property
+    def hot_len(self) -> int:
+        return len(self._tick)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        yield from self._spilled(None, None)
+        for i in range(self._base, self._total):
+            yield self.row(i)
+
+    # ------------------------------------------------------------------
+    def _spilled(self, tick_from: Optional[int], tick_to: Optional[int], agent: Optional[str] = None,
+                 action: Actions = None, target: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Matching rows from the backing log for the part of [tick_from, tick_to] no longer in memory."""
+        if self.spilled_through is None or self.backing is None:
+            return
+        hi = self.spilled_through if tick_to is None else min(tick_to, self.spilled_through)
+        if tick_from is not None and tick_from > hi:
+            return
+        actions = _action_names(action)
+        for r in self.backing.read_range(tick_from, hi):
+            r["action"] = canonical_action(r["action"])
+            if agent is not None and r["agent"] != agent:
+                continue
+            if target is not None and r["target"] != target:
+                continue
+            if actions is not None and r["action"] not in actions:
+                continue
+            yield r
+
+    def _reaches_spill(self, tick_from: Optional[int]) -> bool:
+        return self.spilled_through is not None and (tick_from is None or tick_from <= self.spilled_through)
+
+    def _tick_span(self, tick_from: Optional[int], tick_to: Optional[int]) -> range:
+        """Row-id range covering ticks [tick_from, tick_to] (inclusive) when ticks are ordered."""
+        lo = 0 if tick_from is None else bisect_left(self._tick, tick_from)
+        hi = len(self._tick) if tick_to is None else bisect_right(self._tick, tick_to)
+        return range(self._base + lo, self._base + hi)
+
+    def select(
+        self,
+        agent: Optional[str] = None,
+        action: Actions = None,
+        target: Optional[str] = None,
+        tick_from: Optional[int] = None,
+        tick_to: Optional[int] = None,
+    ) -> List[int]:
+        """Ids of in-memory rows matching every given filter, in insertion order."""
+        candidates = []
+        if agent is not None:
+            code = self._agent_codes.get(agent)
+            candidates.append(self._by_agent.get(code, ()) if code is not None else ())
+        if target is not None:
+            code = self._agent_codes.get(target)
+            candidates.append(self._by_target.get(code, ()) if code is not None else ())
+        actions = self._action_code_set(action)
+        if actions is not None:
+            ids = sorted(i for c in actions for i in self._by_action.get(c, ()))
+            candidates.append(ids)
+
+        ranged = tick_from is not None or tick_to is not None
+        if not candidates:
+            if self._ticks_sorted:
+                return list(self._tick_span(tick_from, tick_to))
+            candidates.append(range(self._base, self._total))
+        elif ranged and self._ticks_sorted:
+            # Row ids grow with tick, so each index narrows to the span by bisection
+            # (a "last 5 ticks" query costs O(log n + matches), not O(history))
+            span = self._tick_span(tick_from, tick_to)
+            candidates = [ids[bisect_left(ids, span.start):bisect_left(ids, span.stop)] for ids in candidates]
+
+        # Drive from the smallest index and check the rest column-wise
+        base = min(candidates, key=len)
+        agent_code = self._agent_codes.get(agent, -2) if agent is not None else None
+        target_code = self._agent_codes.get(target, -2) if target is not None else None
+        lo_t = float("-inf") if tick_from is None else tick_from
+        hi_t = float("inf") if tick_to is None else tick_to
+        out = []
+        for rid in base:
+            i = rid - self._base
+            if agent_code is not None and self._agent[i] != agent_code:
+                continue
+            if target_code is not None and self._target[i] != target_code:
+                continue
+            if actions is not None and self._action[i] not in actions:
+                continue
+            if ranged and not lo_t <= self._tick[i] <= hi_t:
+                continue
+            out.append(rid)
+        return out
+
+    def rows(
+        self,
+        agent: Optional[str] = None,
+        action: Actions = None,
+        target: Optional[str] = None,
+        tick_from: Optional[int] = None,
+        tick_to: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Event dicts matching `select` filters, reading spilled ticks from disk when needed."""
+        out = list(self._spilled(tick_from, tick_to, agent=agent, action=action, target=target))
+        out.extend(self.row(i) for i in self.select(agent, action, target, tick_from, tick_to))
+        return out
+
+    def count(self, action: Actions = None, agent: Optional[str] = None, **filters) -> int:
+        """Number of events; plain action/agent counts come from running totals."""
+        if filters:
+            if self._reaches_spill(filters.get("tick_from")):
+                return len(self.rows(agent=agent, action=action, **filters))
+            return len(self.select(agent=agent, action=action, **filters))
+        actions = self._action_code_set(action)
+        if agent is None:
+            if actions is None:
+                return len(self)
+            return sum(self._action_counts.get(c, 0) for c in actions)
+        code = self._agent_codes.get(agent)
+        if code is None:
+            return 0
+        if actions is None:
+            actions = range(len(self.action_names))
+        return sum(self._agent_action_counts.get((code, c), 0) for c in actions)
+
+    def counts_by_agent(self, action: Actions = None) -> Dict[str, int]:
+        """Per-agent event totals, optionally for a set of actions (e.g. PECK for power Gini)."""
+        actions = self._action_code_set(action)
+        out: Dict[str, int] = defaultdict(int)
+        for (agent, act), n in self._agent_action_counts.items():
+            if n and (actions is None or act in actions):
+                out[self.agent_names[agent]] += n
+        return dict(out)
+
+    def edges(self, action: Actions = None) -> List[tuple]:
+        """
+        Distinct (agent, target, action) triples over the whole run, sorted;
+        kept up to date on append, so the cost doesn't grow with history.
+        """
+        actions = self._action_code_set(action)
+        names, acts = self.agent_names, self.action_names
+        return sorted((names[a], names[t], acts[c]) for a, t, c in self._edges if actions is None or c in actions)
+
+    def action_counts(self) -> Dict[str, int]:
+        return {self.action_names[c]: n for c, n in self._action_counts.items() if n}
+
+    def involving(self, agent: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Events where `agent` was the actor or the target, most recent first."""
+        code = self._agent_codes.get(agent)
+        if code is None:
+            return []
+        ids = sorted(set(self._by_agent.get(code, ())) | set(self._by_target.get(code, ())), reverse=True)
+        if limit is not None:
+            ids = ids[:limit]
+        out = [self.row(i) for i in ids]
+        if (limit is None or len(out) < limit) and self._reaches_spill(None):
+            older = [r for r in self._spilled(None, None) if agent in (r["agent"], r["target"])]
+            older.reverse()
+            out.extend(older if limit is None else older[:limit - len(out)])
+        return out
+
+    def tail(self, n: int) -> List[Dict[str, Any]]:
+        """The last `n` events in insertion order."""
+        start = max(self._base, self._total - n)
+        out = [self.row(i) for i in range(start, self._total)]
+        missing = n - len(out)
+        if missing > 0 and self._reaches_spill(None) and self.backing is not None:
+            older = self.backing.tail(missing, tick_to=self.spilled_through)
+            out = older + out
+        return out
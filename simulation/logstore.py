@@ -0,0 +1,274 @@
+# simulation/logstore.py
+"""
+Segmented action log for Clucktocracy.
+Rows are appended to fixed-size tick segments (seg_<first tick>.csv). When a
+segment fills up it is gzip-compressed and a retention policy drops the oldest
+ones. Every segment has a sidecar (<segment file>.idx) with the byte offset of
+each tick inside it, so readers asking for "ticks A..B" or "the last N rows"
+only open the segments they need and seek straight to the first row. Offsets
+of closed segments are read from their sidecar on demand, never kept in
+memory. index.json holds the log's settings and is written once;
+segments.jsonl is an append-only journal of segments opening, closing and
+being dropped, so no per-segment work grows with run length.
+Ticks are expected to be non-decreasing, as CoopEngine writes them.
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from simulation.events import FIELDS
+
+INDEX_NAME = "index.json"
+JOURNAL_NAME = "segments.jsonl"
+
+
+class SegmentedLog:
+    def __init__(
+        self,
+        path: str,
+        segment_ticks: int = 100,
+        max_segments: Optional[int] = None,
+        retain_ticks: Optional[int] = None,
+        reset: bool = False,
+    ):
+        self.path = path
+        self.segment_ticks = segment_ticks
+        self.max_segments = max_segments    # keep at most this many segments, the open one included
+        self.retain_ticks = retain_ticks    # drop closed segments older than this many ticks
+        self.segments: List[Dict[str, Any]] = []
+
+        if reset and os.path.isdir(path):
+            shutil.rmtree(path)
+        os.makedirs(path, exist_ok=True)
+        index = os.path.join(path, INDEX_NAME)
+        if os.path.exists(index):
+            with open(index, encoding="utf-8") as f:
+                meta = json.load(f)
+            self.segment_ticks = meta.get("segment_ticks", segment_ticks)
+            # Older logs listed every segment (with offsets) in index.json itself
+            self.segments = [{k: v for k, v in seg.items() if k != "offsets"} for seg in meta.get("segments", [])]
+            self._replay_journal()
+            if self._open_segment is not None:
+                self._rescan(self._open_segment)
+        else:
+            self._write_index()
+
+    @classmethod
+    def open(cls, path: str) -> "SegmentedLog":
+        """Attach to an existing log directory (for readers)."""
+        return cls(path)
+
+    # ------------------------------------------------------------------
+    @property
+    def _open_segment(self) -> Optional[Dict[str, Any]]:
+        if self.segments and not self.segments[-1]["closed"]:
+            return self.segments[-1]
+        return None
+
+    def _file(self, seg: Dict[str, Any]) -> str:
+        return os.path.join(self.path, seg["name"])
+
+    def _write_index(self):
+        tmp = os.path.join(self.path, INDEX_NAME + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"segment_ticks": self.segment_ticks, "fields": FIELDS}, f)
+        os.replace(tmp, os.path.join(self.path, INDEX_NAME))
+
+    def _journal(self, *entries: Dict[str, Any]):
+        with open(os.path.join(self.path, JOURNAL_NAME), "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(e) + "\n" for e in entries))
+
+    def _replay_journal(self):
+        """Rebuild the segment list from segments.jsonl (open / close / drop entries)."""
+        journal = os.path.join(self.path, JOURNAL_NAME)
+        if not os.path.exists(journal):
+            return
+        with open(journal, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line (writer mid-append or killed)
+                op = entry.pop("op")
+                if op == "open":
+                    self.segments.append(dict(entry, closed=False))
+                elif op == "close":
+                    self.segments = [dict(entry, closed=True) if seg["tick_start"] == entry["tick_start"] else seg
+                                     for seg in self.segments]
+                elif op == "drop":
+                    self.segments = [seg for seg in self.segments if seg["name"] != entry["name"]]
+
+    def _sidecar(self, seg: Dict[str, Any]) -> str:
+        return self._file(seg) + ".idx"
+
+    def _read_sidecar(self, seg: Dict[str, Any]) -> List[List[int]]:
+        """[tick, offset, rows so far] per tick written to `seg`."""
+        entries: List[List[int]] = []
+        if os.path.exists(self._sidecar(seg)):
+            with open(self._sidecar(seg), encoding="utf-8") as f:
+                for line in f:
+                    tick, offset, rows = map(int, line.split(","))
+                    if not entries or entries[-1][0] != tick:
+                        entries.append([tick, offset, rows])
+                    else:
+                        entries[-1][2] = rows
+        return entries
+
+    def _offsets(self, seg: Dict[str, Any]) -> List[List[int]]:
+        """(tick, offset) pairs: in memory for the open segment, from the sidecar for closed ones."""
+        if "offsets" in seg:
+            return seg["offsets"]
+        return [[tick, offset] for tick, offset, _ in self._read_sidecar(seg)]
+
+    def _rescan(self, seg: Dict[str, Any]):
+        """Reload an open segment's tick offsets from its append-only sidecar file."""
+        entries = self._read_sidecar(seg)
+        seg["offsets"] = [[tick, offset] for tick, offset, _ in entries]
+        if entries:
+            seg["tick_end"], seg["rows"] = entries[-1][0], entries[-1][2]
+
+    def _start_segment(self, tick: int) -> Dict[str, Any]:
+        start = tick - tick % self.segment_ticks
+        seg = {"name": f"seg_{start:010d}.csv", "tick_start": start, "tick_first": tick, "tick_end": tick,
+               "rows": 0, "closed": False}
+        with open(self._file(seg), "wb") as f:
+            f.write((",".join(FIELDS) + "\r\n").encode("utf-8"))
+        self._journal(dict(op="open", **seg))
+        seg["offsets"] = []
+        self.segments.append(seg)
+        return seg
+
+    def _close_segment(self, seg: Dict[str, Any], opening: bool = False):
+        """
+        Compress a full segment in place; offsets stay valid in the decompressed
+        stream, so the sidecar just follows the file and leaves memory.
+        `opening` says another segment is about to start and counts towards max_segments.
+        """
+        src = self._file(seg)
+        with open(src, "rb") as fin, gzip.open(src + ".gz", "wb") as fout:
+            shutil.copyfileobj(fin, fout)
+        os.remove(src)
+        if os.path.exists(self._sidecar(seg)):
+            os.replace(self._sidecar(seg), src + ".gz.idx")
+        seg["name"] += ".gz"
+        seg["closed"] = True
+        del seg["offsets"]
+        self._journal(dict(op="close", **seg))
+        self._apply_retention(opening)
+
+    def _apply_retention(self, opening: bool = False):
+        latest = self.segments[-1]["tick_end"]
+        keep, dropped = [], []
+        for i, seg in enumerate(self.segments):
+            too_many = self.max_segments is not None and len(self.segments) + opening - i > self.max_segments
+            too_old = self.retain_ticks is not None and seg["tick_end"] < latest - self.retain_ticks
+            if seg["closed"] and (too_many or too_old):
+                os.remove(self._file(seg))
+                if os.path.exists(self._sidecar(seg)):
+                    os.remove(self._sidecar(seg))
+                dropped.append({"op": "drop", "name": seg["name"]})
+            else:
+                keep.append(seg)
+        self.segments = keep
+        if dropped:
+            self._journal(*dropped)
+
+    # ------------------------------------------------------------------
+    def append(self, rows: Iterable[Dict[str, Any]]):
+        """Append rows (one tick's worth at a time is typical) and update the index."""
+        by_tick: Dict[int, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_tick.setdefault(int(row["tick"]), []).append(row)
+        if not by_tick:
+            return
+
+        for tick, tick_rows in by_tick.items():
+            seg = self._open_segment
+            if seg is not None and tick >= seg["tick_start"] + self.segment_ticks:
+                self._close_segment(seg, opening=True)
+                seg = None
+            if seg is None:
+                seg = self._start_segment(tick)
+
+            buf = io.StringIO()
+            writer = csv.DictWriter(buf, fieldnames=FIELDS, extrasaction="ignore")
+            writer.writerows(tick_rows)
+            with open(self._file(seg), "ab") as f:
+                offset = f.tell()
+                f.write(buf.getvalue().encode("utf-8"))
+            if not seg["offsets"] or seg["offsets"][-1][0] != tick:
+                seg["offsets"].append([tick, offset])
+            seg["tick_end"] = max(seg["tick_end"], tick)
+            seg["rows"] += len(tick_rows)
+            with open(self._sidecar(seg), "a", encoding="utf-8") as f:
+                f.write(f"{tick},{offset},{seg['rows']}\n")
+
+    def close(self):
+        """Compress the open segment (e.g. at the end of a run)."""
+        seg = self._open_segment
+        if seg is not None:
+            self._close_segment(seg)
+
+    # ------------------------------------------------------------------
+    def _read_segment(self, seg: Dict[str, Any], tick_from: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        opener = gzip.open if seg["closed"] else open
+        with opener(self._file(seg), "rb") as raw:
+            offsets = self._offsets(seg) if tick_from is not None else None
+            if offsets:
+                ticks = [t for t, _ in offsets]
+                i = bisect_left(ticks, tick_from)
+                if i >= len(ticks):
+                    return
+                raw.seek(offsets[i][1])
+            else:
+                raw.readline()  # header
+            text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+            for row in csv.DictReader(text, fieldnames=FIELDS):
+                row["tick"] = int(row["tick"])
+                row["target"] = row["target"] or None
+                yield row
+
+    def read_range(self, tick_from: Optional[int] = None, tick_to: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Rows with tick_from <= tick <= tick_to, touching only overlapping segments."""
+        for seg in list(self.segments):
+            if tick_to is not None and seg["tick_start"] > tick_to:
+                break
+            # An open segment's tick_end may be stale in another process's view of the index
+            if tick_from is not None and seg["closed"] and seg["tick_end"] < tick_from:
+                continue
+            for row in self._read_segment(seg, tick_from):
+                if tick_to is not None and row["tick"] > tick_to:
+                    break
+                if tick_from is None or row["tick"] >= tick_from:
+                    yield row
+
+    def tail(self, n: int, tick_to: Optional[int] = None) -> List[Dict[str, Any]]:
+        """The last `n` rows (up to `tick_to`), reading segments newest-first until enough are found."""
+        chunks: List[List[Dict[str, Any]]] = []
+        found = 0
+        for seg in reversed(list(self.segments)):
+            if tick_to is not None and seg["tick_start"] > tick_to:
+                continue
+            rows = [r for r in self._read_segment(seg) if tick_to is None or r["tick"] <= tick_to]
+            chunks.append(rows)
+            found += len(rows)
+            if found >= n:
+                break
+        out = [r for chunk in reversed(chunks) for r in chunk]
+        return out[-n:] if n else []
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.read_range()
+
+    @property
+    def tick_range(self) -> Optional[tuple]:
+        if not self.segments:
+            return None
+        first = self.segments[0]
+        return first.get("tick_first", first["tick_start"]), self.segments[-1]["tick_end"]
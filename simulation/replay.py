@@ -0,0 +1,145 @@
+# simulation/replay.py
+"""
+Replay stored action logs through CoopEngine's metric, memory and scenario
+pipeline without calling any inference backend. Useful after changing a
+metric definition or scenario rule: recompute every stored episode at full
+speed, several metric sets in one pass, many episodes in parallel.
+
+    python -m simulation.replay data/coop_log old_run.csv --scenario "Startup Coop" --workers 4
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+from chickens.agent import ChickenAgent
+from chickens.scenarios import SCENARIOS, check_scenario
+from simulation.engine import CoopEngine
+from simulation.logstore import INDEX_NAME, SegmentedLog
+
+MetricSet = Callable[[CoopEngine], Dict[str, Any]]
+
+DEFAULT_METRIC_SETS: Dict[str, MetricSet] = {"coop": CoopEngine.compute_metrics}
+
+
+def iter_log_rows(source: str, tick_from: Optional[int] = None,
+                  tick_to: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream rows from a segmented log directory or a CSV file (optionally .gz),
+    normalized to the engine's fields. Old logs with a `result` column are accepted.
+    """
+    if os.path.isdir(source) and os.path.exists(os.path.join(source, INDEX_NAME)):
+        yield from SegmentedLog.open(source).read_range(tick_from, tick_to)
+        return
+
+    opener = gzip.open if source.endswith(".gz") else open
+    with opener(source, "rt", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            tick = int(row["tick"])
+            if tick_from is not None and tick < tick_from:
+                continue
+            if tick_to is not None and tick > tick_to:
+                break
+            yield {
+                "tick": tick,
+                "agent": row["agent"],
+                "action": row["action"],
+                "target": row.get("target") or None,
+                "message": row.get("message") or "",
+                "outcome": row.get("outcome") or row.get("result") or "",
+            }
+
+
+def _resolve_scenario(scenario: Union[str, dict, None]) -> Optional[dict]:
+    # Scenarios hold lambdas, so worker processes receive them by name
+    if isinstance(scenario, str):
+        for s in SCENARIOS:
+            if s["name"] == scenario:
+                return s
+        names = ", ".join(repr(s["name"]) for s in SCENARIOS)
+        raise ValueError(f"unknown scenario {scenario!r}; expected one of: {names}")
+    return scenario
+
+
+def replay(
+    source: str,
+    metric_sets: Dict[str, MetricSet] = None,
+    scenario: Union[str, dict, None] = None,
+    agents: Sequence[ChickenAgent] = None,
+    tick_from: Optional[int] = None,
+    tick_to: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Feed a stored log back through an in-memory CoopEngine, tick by tick.
+    Returns per-tick results for every metric set, the final values and the
+    first tick at which the scenario was won or lost.
+    """
+    metric_sets = metric_sets or DEFAULT_METRIC_SETS
+    scenario = _resolve_scenario(scenario)
+
+    # Agents only matter for memories/positions; unknown names are created on first sight
+    engine = CoopEngine(list(agents or []), max_ticks=float("inf"), persist=False)
+    results: Dict[str, List[Dict[str, Any]]] = {name: [] for name in metric_sets}
+    outcome = {"status": "", "tick": None}
+    rows = 0
+
+    for tick, group in groupby(iter_log_rows(source, tick_from, tick_to), key=lambda r: r["tick"]):
+        tick_rows = list(group)
+        for name in sorted({r["agent"] for r in tick_rows} - {a.name for a in engine.agents}):
+            engine.add_agent(ChickenAgent(name))
+        engine.step(actions=tick_rows, ai_actions=[], tick=tick)
+        rows += len(tick_rows)
+
+        for name, fn in metric_sets.items():
+            results[name].append({"tick": tick, **fn(engine)})
+        if scenario and not outcome["status"]:
+            status = check_scenario(scenario, engine.history)
+            if status:
+                outcome = {"status": status, "tick": tick}
+
+    return {
+        "source": source,
+        "rows": rows,
+        "ticks": len(next(iter(results.values()), [])),
+        "metrics": results,
+        "final": {name: (vals[-1] if vals else {}) for name, vals in results.items()},
+        "scenario": outcome,
+    }
+
+
+def replay_many(sources: Sequence[str], workers: Optional[int] = None, **kwargs) -> List[Dict[str, Any]]:
+    """
+    Replay many episodes in parallel worker processes (results in input order).
+    Metric sets must be module-level functions so they can be pickled.
+    """
+    _resolve_scenario(kwargs.get("scenario"))  # bad names fail here, before any worker starts
+    if workers == 1 or len(sources) <= 1:
+        return [replay(src, **kwargs) for src in sources]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(replay, src, **kwargs) for src in sources]
+        return [f.result() for f in futures]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute metrics and scenarios from stored logs")
+    parser.add_argument("sources", nargs="+", help="Segmented log dirs or CSV logs")
+    parser.add_argument("--scenario", type=str, default=None, help="Scenario name to evaluate")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel worker processes")
+    parser.add_argument("--json", action="store_true", help="Print full per-tick results as JSON")
+    args = parser.parse_args()
+
+    out = replay_many(args.sources, workers=args.workers, scenario=args.scenario)
+    if args.json:
+        print(json.dumps(out, indent=2))
+    else:
+        for res in out:
+            status = res["scenario"]["status"]
+            verdict = f", scenario {status} at tick {res['scenario']['tick']}" if status else ""
+            print(f"{res['source']}: {res['rows']} rows / {res['ticks']} ticks{verdict}")
+            for name, final in res["final"].items():
+                print(f"  {name}: {final}")
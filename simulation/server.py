@@ -0,0 +1,314 @@
+# simulation/server.py
+"""
+CoopServer — hosts many CoopEngines in one process.
+Coops tick on their own schedule; every scheduling window the server collects
+the coops that are due (oldest deadline first, so no coop starves), merges
+their per-agent inference requests into one batch on a shared worker pool and
+HTTP connection pool, then hands each coop its actions. Hens that haven't
+answered by the coop's deadline (its engine's TickDeadline, else the
+server's deadline_s) get a fallback action, so one slow server can't hold up
+the window. Clients (HUD sessions, CLI) attach by coop id and get the same
+interface as simulation.autoplay.AutoPlayer.
+
+    python -m simulation.server --coops 8 --ticks 50 --backend mock
+"""
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from gpt.inference import ai_action_jobs, fallback_action
+from gpt.usage import bill_when_done
+from simulation.autoplay import next_tick, snapshot
+from simulation.engine import CoopEngine
+
+COOPS_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "coops")
+
+
+class HostedCoop:
+    """One coop living in a CoopServer; AutoPlayer-compatible handle for clients."""
+
+    def __init__(self, server: "CoopServer", coop_id: str, engine: CoopEngine, ticks_per_second: float,
+                 inference: Dict[str, Any], scenario: dict = None):
+        self.server = server
+        self.coop_id = coop_id
+        self.engine = engine
+        self.ticks_per_second = ticks_per_second
+        self.inference = inference      # backend/model/api_base/api_key/reasoning_effort
+        self.step_kwargs: Dict[str, Any] = {}
+        self.scenario = scenario
+        self.lock = threading.RLock()
+        self.error: Optional[BaseException] = None
+        self.paused = False
+        self.next_due = time.monotonic()
+        self._pending_human: Optional[Dict[str, Any]] = None
+        self._latest: Optional[Dict[str, Any]] = None
+
+    # --- client interface (mirrors AutoPlayer) -------------------------
+    @property
+    def running(self) -> bool:
+        return not self.paused and not self.finished and self.server.running
+
+    @property
+    def finished(self) -> bool:
+        return next_tick(self.engine) >= self.engine.max_ticks or self.error is not None
+
+    def start(self):
+        if self.paused:
+            self.paused = False
+            self.next_due = time.monotonic()
+        self.server.start()
+
+    def stop(self, timeout: float = 0.0):
+        self.paused = True
+
+    def submit(self, human_override: Dict[str, Any]):
+        with self.lock:
+            self._pending_human = human_override
+
+    def step_now(self, **kwargs) -> list:
+        """
+        Manual tick outside the scheduler (inference runs on the caller's thread);
+        a queued human action is used unless the caller passes `human_override`.
+        """
+        with self.lock:
+            if "human_override" not in kwargs:
+                kwargs["human_override"], self._pending_human = self._pending_human, None
+            out = self.engine.step(tick=next_tick(self.engine), **{**self.inference, **self.step_kwargs, **kwargs})
+            self._latest = snapshot(self.engine, scenario=self.scenario)
+        return out
+
+    def latest(self) -> Dict[str, Any]:
+        if self._latest is None:
+            with self.lock:
+                self._latest = snapshot(self.engine, scenario=self.scenario)
+        return self._latest
+
+    # --- server side -------------------------------------------------
+    def _apply(self, tick: int, ai_actions: List[Dict[str, Any]], wall_s: float = None):
+        with self.lock:
+            human, self._pending_human = self._pending_human, None
+            self.engine.step(tick=tick, human_override=human, ai_actions=ai_actions, infer_wall_s=wall_s,
+                             **self.step_kwargs)
+            self._latest = snapshot(self.engine, scenario=self.scenario)
+
+
+class CoopServer:
+    def __init__(self, max_workers: int = 16, window_s: float = 0.05, data_dir: str = COOPS_DIR,
+                 deadline_s: Optional[float] = 5.0):
+        self.coops: Dict[str, HostedCoop] = {}
+        self.window_s = window_s          # due coops within this window share a batch
+        self.deadline_s = deadline_s      # per-tick inference deadline for coops without their own
+        self.data_dir = data_dir
+        self.max_workers = max_workers    # requests in flight; hens queued past the deadline fall back
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="coop-infer")
+        self.windows = 0
+        self.batched_requests = 0
+        self.fallbacks = 0
+        self.error: Optional[BaseException] = None  # last scheduler failure (the loop keeps going)
+        self._session = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    @property
+    def session(self):
+        """Shared HTTP connection pool, created on first LLM use."""
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=self.max_workers)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+        return self._session
+
+    def create_coop(self, coop_id: str, agents, ticks_per_second: float = 1.0, backend: str = "mock",
+                    model: str = "openai/gpt-oss-20b", api_base: str = None, api_key: str = None,
+                    reasoning_effort: str = "medium", scenario: dict = None, **engine_kwargs) -> HostedCoop:
+        with self._lock:
+            if coop_id in self.coops:
+                raise ValueError(f"coop {coop_id!r} already exists")
+            engine = CoopEngine(agents, data_dir=os.path.join(self.data_dir, coop_id), **engine_kwargs)
+            inference = {"backend": backend, "model": model, "api_base": api_base,
+                         "api_key": api_key, "reasoning_effort": reasoning_effort}
+            coop = HostedCoop(self, coop_id, engine, ticks_per_second, inference, scenario)
+            self.coops[coop_id] = coop
+            return coop
+
+    def attach(self, coop_id: str) -> HostedCoop:
+        """Handle for an existing coop; raises KeyError for unknown ids."""
+        with self._lock:
+            return self.coops[coop_id]
+
+    def _coops(self) -> List[HostedCoop]:
+        """Snapshot of the hosted coops, safe against concurrent create/remove."""
+        with self._lock:
+            return list(self.coops.values())
+
+    def remove(self, coop_id: str):
+        with self._lock:
+            coop = self.coops.pop(coop_id, None)
+        if coop is not None:
+            coop.engine.close()
+
+    # ------------------------------------------------------------------
+    def _due(self, now: float) -> List[HostedCoop]:
+        ready = [c for c in self._coops()
+                 if not c.paused and not c.finished and c.next_due <= now + self.window_s]
+        return sorted(ready, key=lambda c: c.next_due)
+
+    def run_window(self, now: float = None) -> List[str]:
+        """Step every coop due in this window with one merged inference batch; returns their ids."""
+        now = time.monotonic() if now is None else now
+        due = self._due(now)
+        if not due:
+            return []
+
+        # Routed coops pick per-hen tiers themselves, so they step on the pool individually
+        # A failing coop records its error and drops out; the rest of the window goes on.
+        batch, spans, solo = [], [], []
+        for coop in due:
+            tick = next_tick(coop.engine)
+            if coop.engine.router is not None:
+                solo.append(coop)
+                continue
+            cfg = coop.inference
+            try:
+                session = self.session if cfg["backend"] != "mock" else None
+                with coop.lock:
+                    jobs = ai_action_jobs(coop.engine.agents, tick, grid=coop.engine.grid,
+                                          radius=coop.engine.interaction_radius, prompts=coop.engine.prompts,
+                                          session=session, **cfg)
+            except Exception as e:
+                coop.error = e
+                continue
+            spans.append((coop, tick, len(batch), len(batch) + len(jobs)))
+            batch.extend(jobs)
+
+        started = time.monotonic()
+        futures = [self.executor.submit(job) for job in batch]
+        solo_futures = [(c, self.executor.submit(c.step_now)) for c in solo]
+        self.windows += 1
+        self.batched_requests += len(batch)
+
+        for coop, tick, lo, hi in sorted(spans, key=lambda span: self._deadline(span[0])):
+            limit = self._deadline(coop)
+            timeout = None if limit == float("inf") else max(0.0, started + limit - time.monotonic())
+            wait(futures[lo:hi], timeout=timeout)
+            actions = []
+            for fut, job in zip(futures[lo:hi], batch[lo:hi]):
+                if fut.done() and fut.exception() is None:
+                    actions.append(fut.result())
+                else:
+                    actions.append(dict(fallback_action(job), outcome="fallback"))
+                    # A request still queued is dropped so it can't hold up the next window;
+                    # one a server is already working on still costs its tokens.
+                    if not fut.cancel():
+                        bill_when_done(fut, coop.engine.usage)
+                    self.fallbacks += 1
+            try:
+                coop._apply(tick, actions, wall_s=time.monotonic() - started)
+            except Exception as e:
+                coop.error = e
+        for coop, fut in solo_futures:
+            try:
+                fut.result()
+            except Exception as e:
+                coop.error = e
+
+        for coop in due:
+            interval = 1.0 / max(coop.ticks_per_second, 1e-6)
+            # Stay on schedule, but don't try to catch up on missed ticks in a burst
+            coop.next_due = max(coop.next_due + interval, now)
+        return [c.coop_id for c in due]
+
+    def _deadline(self, coop: HostedCoop) -> float:
+        """Seconds a coop's hens get to answer within a window (inf: wait for all)."""
+        if coop.engine.deadline is not None:
+            return coop.engine.deadline.deadline_s
+        return self.deadline_s if self.deadline_s is not None else float("inf")
+
+    # ------------------------------------------------------------------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="coop-server", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_window()
+            except Exception as e:  # never let one bad window kill scheduling for every coop
+                self.error = e
+            pending = [c.next_due for c in self._coops() if not c.paused and not c.finished]
+            wait = min(pending) - time.monotonic() if pending else 0.1
+            self._stop.wait(max(0.0, min(wait, 0.1)))
+
+    def shutdown(self):
+        self.stop()
+        for coop in self._coops():
+            self.remove(coop.coop_id)
+        self.executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    from gpt.pool import STRATEGIES, get_pool
+    from run import build_flock
+    from simulation.rng import SeedTree
+
+    parser = argparse.ArgumentParser(description="Host several coops in one process")
+    parser.add_argument("--coops", type=int, default=4, help="Number of coops to host")
+    parser.add_argument("--ticks", type=int, default=20, help="Ticks per coop")
+    parser.add_argument("--num_agents", type=int, default=4, help="Chickens per coop")
+    parser.add_argument("--rate", type=float, default=20.0, help="Ticks per second per coop")
+    parser.add_argument("--backend", type=str, default="mock", help="Backend for every coop")
+    parser.add_argument("--model", type=str, default="openai/gpt-oss-20b", help="Model name")
+    parser.add_argument("--seed", type=int, default=None, help="Run seed (each coop gets a derived one)")
+    parser.add_argument("--api-base", type=str, default=None, help="Inference server base URL(s), comma-separated for a pool")
+    parser.add_argument("--balance", type=str, default="least-outstanding", choices=STRATEGIES,
+                        help="How a multi-URL --api-base spreads requests over its servers")
+    parser.add_argument("--health-interval", type=float, default=None,
+                        help="Seconds between /models health checks of a multi-URL --api-base (off if omitted)")
+    parser.add_argument("--tick-deadline", type=float, default=5.0,
+                        help="Seconds per tick before slow hens get a fallback action")
+    args = parser.parse_args()
+
+    get_pool(args.api_base, strategy=args.balance, health_interval_s=args.health_interval)
+    run_seeds = SeedTree(args.seed)
+    server = CoopServer(deadline_s=args.tick_deadline)
+    for i in range(args.coops):
+        coop_seeds = run_seeds.child("episode", i)
+        server.create_coop(f"coop_{i+1}", build_flock(args.num_agents, rng=coop_seeds.rng("flock")),
+                           ticks_per_second=args.rate, backend=args.backend, model=args.model,
+                           api_base=args.api_base, max_ticks=args.ticks, seed=coop_seeds.seed)
+
+    started = time.perf_counter()
+    server.start()
+    while any(not c.finished for c in server._coops()):
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    for coop_id, coop in server.coops.items():
+        print(f"{coop_id}: tick {coop.engine.tick}, {len(coop.engine.history)} events, "
+              f"metrics {coop.engine.compute_metrics()}")
+    print(f"{server.windows} windows, {server.batched_requests} batched requests "
+          f"({server.fallbacks} fallbacks) in {elapsed:.2f}s")
+    server.shutdown()
@@ -0,0 +1,102 @@
+# simulation/spatial.py
+"""
+Uniform-grid spatial hash for hen positions in the coop yard.
+Neighbor queries only visit the cells overlapping the query radius,
+so interaction lookups cost O(k) per hen instead of scanning the flock.
+"""
+
+import math
+import random
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+Cell = Tuple[int, int]
+
+
+class SpatialGrid:
+    def __init__(self, width: float = 10.0, height: float = 10.0, cell_size: float = 2.0):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.positions: Dict[str, Tuple[float, float]] = {}
+        self._cells: Dict[Cell, Set[str]] = {}
+
+    # ------------------------------------------------------------------
+    def _cell(self, x: float, y: float) -> Cell:
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def _clamp(self, x: float, y: float) -> Tuple[float, float]:
+        return min(max(x, 0.0), self.width), min(max(y, 0.0), self.height)
+
+    def place(self, name: str, x: float, y: float):
+        """Put (or teleport) a hen at (x, y), clamped to the yard."""
+        self.remove(name)
+        x, y = self._clamp(x, y)
+        self.positions[name] = (x, y)
+        self._cells.setdefault(self._cell(x, y), set()).add(name)
+
+    def remove(self, name: str):
+        pos = self.positions.pop(name, None)
+        if pos is None:
+            return
+        cell = self._cell(*pos)
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.discard(name)
+            if not bucket:
+                del self._cells[cell]
+
+    def move(self, name: str, dx: float, dy: float):
+        """Shift a hen by (dx, dy); only touches the cell index when it changes cell."""
+        x, y = self.positions[name]
+        nx, ny = self._clamp(x + dx, y + dy)
+        old, new = self._cell(x, y), self._cell(nx, ny)
+        self.positions[name] = (nx, ny)
+        if old != new:
+            self._cells[old].discard(name)
+            if not self._cells[old]:
+                del self._cells[old]
+            self._cells.setdefault(new, set()).add(name)
+
+    def resize(self, width: float, height: float):
+        """Grow (or shrink) the yard; hens outside the new bounds are pulled back in."""
+        self.width, self.height = width, height
+        for name, (x, y) in list(self.positions.items()):
+            if (x, y) != self._clamp(x, y):
+                self.place(name, x, y)
+
+    def scatter(self, names: Iterable[str], rng: Optional[random.Random] = None):
+        """Place hens uniformly at random across the yard."""
+        rng = rng or random
+        for name in names:
+            self.place(name, rng.uniform(0, self.width), rng.uniform(0, self.height))
+
+    def wander(self, name: str, step: float = 1.0, rng: Optional[random.Random] = None):
+        """Random walk of at most `step` units in a random direction."""
+        rng = rng or random
+        angle = rng.uniform(0, 2 * math.pi)
+        dist = rng.uniform(0, step)
+        self.move(name, dist * math.cos(angle), dist * math.sin(angle))
+
+    # ------------------------------------------------------------------
+    def neighbors(self, name: str, radius: float) -> List[str]:
+        """Names of hens within `radius` of `name` (excluding itself), sorted by name."""
+        if name not in self.positions:
+            return []
+        x, y = self.positions[name]
+        return [n for n in self.query(x, y, radius) if n != name]
+
+    def query(self, x: float, y: float, radius: float) -> List[str]:
+        """Names of hens within `radius` of the point (x, y), sorted by name."""
+        r2 = radius * radius
+        reach = int(math.ceil(radius / self.cell_size))
+        cx, cy = self._cell(x, y)
+        found = []
+        for i in range(cx - reach, cx + reach + 1):
+            for j in range(cy - reach, cy + reach + 1):
+                for other in self._cells.get((i, j), ()):
+                    ox, oy = self.positions[other]
+                    if (ox - x) ** 2 + (oy - y) ** 2 <= r2:
+                        found.append(other)
+        # Sets iterate in hash order; sort so target choice doesn't depend on it.
+        found.sort()
+        return found
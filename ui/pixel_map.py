@@ -1,21 +1,41 @@
 import matplotlib.pyplot as plt
 import streamlit as st
 
-def render_pixel_map(rows, agents):
+def render_pixel_map(rows, agents, grid=None, positions=None):
+    """
+    Draw hens at their yard positions in one scatter call.
+    `positions` (name -> (x, y)) overrides grid.positions, e.g. from a snapshot.
+    """
+    if positions is None and grid is not None:
+        positions = grid.positions
     fig, ax = plt.subplots(figsize=(6,4))
-    ax.set_xlim(0, 10)
-    ax.set_ylim(0, 10)
+    width = grid.width if grid is not None else 10
+    height = grid.height if grid is not None else 10
+    ax.set_xlim(0, width)
+    ax.set_ylim(0, height)
 
     colors = ["red", "blue", "green", "orange", "purple", "yellow"]
-    positions = {}
+    names, xs, ys, cs = [], [], [], []
 
     for i, a in enumerate(agents):
-        x, y = (i % 5) * 2 + 1, (i // 5) * 2 + 1
-        positions[a.name] = (x,y)
-        ax.scatter(x, y, c=colors[i % len(colors)], s=800, marker="o")
-        ax.text(x, y+0.5, a.name, ha="center", color="white", fontsize=10)
+        if positions and a.name in positions:
+            x, y = positions[a.name]
+        else:
+            x, y = (i % 5) * 2 + 1, (i // 5) * 2 + 1
+        names.append(a.name)
+        xs.append(x)
+        ys.append(y)
+        cs.append(colors[i % len(colors)])
+
+    # Shrink markers as the flock grows so big coops stay readable
+    size = max(40, 800 // max(1, len(names) // 5))
+    ax.scatter(xs, ys, c=cs, s=size, marker="o")
+    if len(names) <= 30:
+        for name, x, y in zip(names, xs, ys):
+            ax.text(x, y+0.5, name, ha="center", color="white", fontsize=10)
 
     ax.set_xticks([])
     ax.set_yticks([])
     ax.set_facecolor("#1e1e1e")
     st.pyplot(fig)
+    plt.close(fig)
@@ -1,12 +1,15 @@
 # ui/streamlit_app.py
 
 import os
+import sys
 import json
 import csv
 import streamlit as st
 import networkx as nx
 import matplotlib.pyplot as plt
-from collections import defaultdict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from simulation.events import EventStore
 
 # Paths
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
@@ -31,39 +34,26 @@ def load_memories():
         return json.load(f)
 
 
-def build_graph(log_rows):
+def build_graph(events):
     """Builds a graph of chickens based on alliances, sanctions, rumors."""
     G = nx.DiGraph()
-    for row in log_rows:
-        agent = row["agent"]
-        target = row["target"]
-        action = row["action"]
-
-        G.add_node(agent)
-        if target:
-            G.add_node(target)
-            if action == "ally":
-                G.add_edge(agent, target, color="green")
-            elif action == "sanction":
-                G.add_edge(agent, target, color="red")
-            elif action == "spread_rumor":
-                G.add_edge(agent, target, color="orange")
+    G.add_nodes_from(events.agent_names)
+    colors = {"ALLY": "green", "SANCTION": "red", "GOSSIP": "orange"}
+    for row in events.rows(action=tuple(colors)):
+        if row["target"]:
+            G.add_edge(row["agent"], row["target"], color=colors[row["action"]])
     return G
 
 
-def compute_metrics(log_rows):
+def compute_metrics(events):
     """Toy metrics based on counts — can be expanded."""
-    metrics = defaultdict(int)
-    for row in log_rows:
-        metrics[row["action"]] += 1
-
-    total = len(log_rows) or 1
+    total = len(events) or 1
     return {
-        "Hierarchy steepness (pecks)": metrics.get("initiate_fight", 0) / total,
-        "Policy inertia (proposals - votes)": metrics.get("propose", 0) - metrics.get("vote", 0),
-        "Coalition signals (alliances)": metrics.get("ally", 0),
-        "Rumor activity": metrics.get("spread_rumor", 0),
-        "Sanctions applied": metrics.get("sanction", 0),
+        "Hierarchy steepness (pecks)": events.count("PECK") / total,
+        "Policy inertia (proposals - votes)": events.count("PROPOSE") - events.count("VOTE"),
+        "Coalition signals (alliances)": events.count("ALLY"),
+        "Rumor activity": events.count("GOSSIP"),
+        "Sanctions applied": events.count("SANCTION"),
     }
 
 
@@ -99,6 +89,7 @@ if st.sidebar.button("Refresh data"):
 
 # Load data
 log_rows = load_log()
+events = EventStore(log_rows)
 memories = load_memories()
 
 # Layout: 2 columns
@@ -110,10 +101,10 @@ with col1:
     if not log_rows:
         st.info("No logs yet. Run `python run.py --backend mock` first.")
     else:
-        for row in log_rows[-50:]:  # last 50
+        for row in events.tail(50):  # last 50
             st.write(
                 f"[Tick {row['tick']}] **{row['agent']}** → {row['action']} "
-                f"({row['result']})  \n"
+                f"({row['outcome']})  \n"
                 f"💬 {row['message']}"
             )
 
@@ -121,7 +112,7 @@ with col1:
 with col2:
     st.subheader("Coop Network")
     if log_rows:
-        G = build_graph(log_rows)
+        G = build_graph(events)
         colors = [edata.get("color", "gray") for _, _, edata in G.edges(data=True)]
         fig, ax = plt.subplots(figsize=(5, 5))
         nx.draw_networkx(G, ax=ax, with_labels=True, node_color="lightblue", edge_color=colors)
@@ -141,6 +132,6 @@ else:
 
 # Metrics
 st.subheader("Coop Metrics")
-metrics = compute_metrics(log_rows)
+metrics = compute_metrics(events)
 for k, v in metrics.items():
     st.metric(label=k, value=v)
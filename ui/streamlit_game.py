@@ -7,9 +7,6 @@ Simplified rollback version (no broken backend args).
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-import csv, json, random
-from collections import defaultdict
-
 import streamlit as st
 import matplotlib.pyplot as plt
 import networkx as nx
@@ -17,7 +14,11 @@ import networkx as nx
 from chickens.agent import ChickenAgent
 from chickens.scenarios import SCENARIOS
 from chickens.personalities import CHICKEN_ARCHETYPES
-from simulation.engine import CoopEngine, LOG_PATH, MEM_PATH
+from simulation.autoplay import AutoPlayer
+from simulation.engine import CoopEngine
+from simulation.rng import SeedTree
+from simulation.server import CoopServer, HostedCoop
+from ui.pixel_map import render_pixel_map
 
 # ---------- Style ----------
 st.set_page_config(page_title="Clucktocracy", layout="wide")
@@ -62,22 +63,8 @@ h1, h2, h3 { color: #ff005d; }
 st.title("CLUCKTOCRACY — Coop Simulation HUD")
 
 # ---------- Helpers ----------
-def load_log_rows():
-    if not os.path.exists(LOG_PATH): return []
-    with open(LOG_PATH, newline="", encoding="utf-8") as f:
-        return list(csv.DictReader(f))
-
-def load_mem():
-    if not os.path.exists(MEM_PATH): return {}
-    with open(MEM_PATH, encoding="utf-8") as f:
-        return json.load(f)
-
-def compute_power_gini(rows):
-    """Toy proxy: outbound 'PECK' count per agent -> Gini coefficient."""
-    counts = defaultdict(int)
-    for r in rows:
-        if r["action"] in ("PECK","initiate_fight"):
-            counts[r["agent"]] += 1
+def compute_power_gini(counts):
+    """Toy proxy: outbound PECK count per agent -> Gini coefficient."""
     if not counts:
         return 0.0
     vals = sorted(counts.values())
@@ -89,6 +76,11 @@ def compute_power_gini(rows):
     gini = (2*cum)/(n*total) - (n+1)/n
     return max(0.0, round(gini, 3))
 
+@st.cache_resource
+def get_server():
+    """One CoopServer per Streamlit process, shared by every browser session."""
+    return CoopServer()
+
 # ---------- Sidebar ----------
 st.sidebar.header("Scenario")
 scenario_name = st.sidebar.selectbox(
@@ -96,13 +88,28 @@ scenario_name = st.sidebar.selectbox(
     [s["name"] for s in SCENARIOS] + ["Custom"]
 )
 
+seed_text = st.sidebar.text_input("Seed (optional)",
+                                  help="The same seed and choices replay the same coop.").strip()
+
 st.sidebar.markdown("### Constitution")
 c1 = st.sidebar.checkbox("Term limits", value=False)
 c2 = st.sidebar.checkbox("Rumor audits", value=True)
 c3 = st.sidebar.checkbox("Equal talk-time", value=False)
 
+st.sidebar.markdown("### Hosting")
+shared_coop = st.sidebar.text_input("Shared coop id (optional)",
+                                    help="Sessions using the same id play in one server-hosted coop.").strip()
+
+st.sidebar.markdown("### Autoplay")
+autoplay = st.sidebar.toggle("Run coop automatically", value=False, disabled=bool(shared_coop),
+                             help="Shared coops are paused and resumed with the buttons below.")
+tick_rate = st.sidebar.slider("Ticks per second", 0.2, 5.0, 1.0, step=0.2)
+
 # ---------- Session boot ----------
 if "engine" not in st.session_state:
+    seeds = SeedTree(int(seed_text) if seed_text.lstrip("-").isdigit() else None)
+    st.session_state.seed = seeds.seed
+    st.session_state.hud_rng = seeds.rng("hud")
     agents = [ChickenAgent("hen_human", "curious", "reformer")]
 
     if scenario_name != "Custom":
@@ -110,8 +117,9 @@ if "engine" not in st.session_state:
         for arche in scenario["chickens"]:
             agents.append(ChickenAgent(**arche))
         st.session_state.constitution = dict(scenario["constitution"])
+        st.session_state.scenario = scenario
     else:
-        chosen = random.sample(CHICKEN_ARCHETYPES, 3)
+        chosen = seeds.rng("flock").sample(CHICKEN_ARCHETYPES, 3)
         for arche in chosen:
             agents.append(ChickenAgent(**arche))
         st.session_state.constitution = {
@@ -120,7 +128,20 @@ if "engine" not in st.session_state:
             "equal_talk_time": c3,
         }
 
-    st.session_state.engine = CoopEngine(agents, max_ticks=240, log_interval=4)
+    if shared_coop:
+        server = get_server()
+        try:
+            player = server.attach(shared_coop)
+        except KeyError:
+            player = server.create_coop(shared_coop, agents, max_ticks=240, log_interval=4,
+                                        scenario=st.session_state.get("scenario"), seed=seeds.seed)
+            player.stop()  # new shared coops wait for someone to press "Resume coop"
+        st.session_state.engine = player.engine
+        st.session_state.player = player
+    else:
+        st.session_state.engine = CoopEngine(agents, max_ticks=240, log_interval=4, seed=seeds.seed)
+        st.session_state.player = AutoPlayer(st.session_state.engine,
+                                             scenario=st.session_state.get("scenario"))
 
 # ✅ Safe defaults
 st.session_state.setdefault("tick", 0)
@@ -151,54 +172,88 @@ with colA:
     msg = st.text_area("Message / Rumor / Policy text")
     st.markdown('</div>', unsafe_allow_html=True)
 with colB:
-    st.metric("Reputation", random.randint(40,95))
-    st.metric("Stability Effect", random.choice(["+","–","~"]))
-    st.metric("Trust Coins", random.randint(1,10))
+    hud_rng = st.session_state.hud_rng
+    st.metric("Reputation", hud_rng.randint(40,95))
+    st.metric("Stability Effect", hud_rng.choice(["+","–","~"]))
+    st.metric("Trust Coins", hud_rng.randint(1,10))
 
 human_override = {"action": act, "target": target.strip() or None, "message": msg.strip()}
 
 # ---------- Advance tick ----------
-go = st.button("Next Tick", use_container_width=True, type="primary")
-if go:
-    engine.step(  # ✅ simple again
-        human_override=human_override,
-        constitution=st.session_state.constitution,
-    )
-    engine.save_state()
-    st.session_state.tick = engine.tick
-    st.rerun()
-
-# ---------- Data ----------
-rows = load_log_rows()
-mems = load_mem()
-
-# ---------- Rumor Feed ----------
-st.subheader("Rumor Feed")
-if not rows:
-    st.info("Click Next Tick to start the coop.")
+player = st.session_state.player  # AutoPlayer, or a HostedCoop when sharing a coop
+player.step_kwargs = {"constitution": st.session_state.constitution}
+shared = isinstance(player, HostedCoop)
+
+if shared:
+    # A shared coop runs for every session attached to it, so it is only paused
+    # or resumed by an explicit click, never as a side effect of a rerun.
+    player.server.start()
+    colP, colQ = st.columns(2)
+    with colP:
+        if player.paused:
+            if st.button("Resume coop", use_container_width=True):
+                player.start()
+                st.rerun()
+        elif st.button("Pause coop", use_container_width=True):
+            player.stop()
+            st.rerun()
+    with colQ:
+        if player.paused:
+            if st.button("Next Tick", use_container_width=True, type="primary"):
+                player.step_now(human_override=human_override)
+                engine.save_state()
+                st.session_state.tick = engine.tick
+        elif st.button("Queue Action for Next Tick", use_container_width=True, type="primary"):
+            player.submit(human_override)
+    autoplay = not player.paused
+elif autoplay:
+    player.ticks_per_second = tick_rate
+    player.start()
+    if st.button("Queue Action for Next Tick", use_container_width=True, type="primary"):
+        player.submit(human_override)
 else:
-    for r in rows[-60:]:
-        label = "[ATTACK]" if r["action"] in ("PECK","initiate_fight") else \
-                "[RUMOR]" if r["action"] in ("GOSSIP","spread_rumor") else \
+    player.stop()
+    if st.button("Next Tick", use_container_width=True, type="primary"):
+        player.step_now(human_override=human_override)
+        engine.save_state()
+        st.session_state.tick = engine.tick
+
+if player.error is not None:
+    st.error(f"Autoplay stopped: {player.error}")
+
+refresh = 1.0 / tick_rate if autoplay else None
+
+# ---------- Live panels (fragments rerun on their own timer) ----------
+@st.fragment(run_every=refresh)
+def feed_panel():
+    snap = player.latest()
+    if snap["scenario_status"]:
+        st.markdown(f'<div class="banner">Scenario "{player.scenario["name"]}": '
+                    f'{snap["scenario_status"].upper()}</div>', unsafe_allow_html=True)
+    st.subheader(f"Rumor Feed — tick {snap['tick']}")
+    if not snap["n_events"]:
+        st.info("Click Next Tick to start the coop.")
+        return
+    for r in snap["feed"]:
+        label = "[ATTACK]" if r["action"]=="PECK" else \
+                "[RUMOR]" if r["action"]=="GOSSIP" else \
                 "[POLICY]" if r["action"] in ("PROPOSE","VOTE") else \
                 "[SANCTION]" if r["action"]=="SANCTION" else "[MOVE]"
         st.markdown(f"- [t={r['tick']}] {r['agent']} → {r['action']} :: {r['message']} {label}")
 
-# ---------- Coop Map + Metrics ----------
-st.subheader("Coop Map & Metrics")
-col1, col2 = st.columns([1.2, 1])
-with col1:
-    if rows:
+
+# The graph layout is the slowest panel, so it refreshes less often
+@st.fragment(run_every=refresh * 4 if refresh else None)
+def map_panel():
+    snap = player.latest()
+    if snap["n_events"]:
         G = nx.DiGraph()
-        for r in rows:
-            a, tgt, actn = r["agent"], r["target"], r["action"]
-            G.add_node(a)
-            if tgt:
-                G.add_node(tgt)
-                color = "green" if actn.lower()=="ally" else \
-                        "red" if actn.lower()=="sanction" else \
-                        "orange" if actn.lower() in ("gossip","spread_rumor") else "gray"
-                G.add_edge(a, tgt, color=color)
+        G.add_nodes_from(a.name for a in engine.agents)
+        for a, tgt, actn in snap["edges"]:
+            color = "green" if actn=="ALLY" else \
+                    "red" if actn=="SANCTION" else \
+                    "orange" if actn=="GOSSIP" else "gray"
+            G.add_edge(a, tgt, color=color)
         colors = [edata.get("color","gray") for *_ , edata in G.edges(data=True)]
         fig, ax = plt.subplots(figsize=(6,4))
         pos = nx.spring_layout(G, seed=7)
@@ -207,45 +262,79 @@ with col1:
                          edge_color=colors, with_labels=True, ax=ax, font_color="black")
         plt.axis("off")
         st.pyplot(fig)
+        plt.close(fig)
     else:
         st.info("Graph will appear after a few actions.")
-with col2:
+    render_pixel_map(snap["feed"], engine.agents, grid=engine.grid, positions=snap["positions"])
+
+
+@st.fragment(run_every=refresh)
+def metrics_panel():
+    snap = player.latest()
     st.markdown("#### Coop Metrics")
-    if rows:
-        total = len(rows)
-        pecks   = sum(1 for r in rows if r["action"] in ("PECK","initiate_fight"))
-        rumors  = sum(1 for r in rows if r["action"] in ("GOSSIP","spread_rumor"))
-        allies  = sum(1 for r in rows if r["action"]=="ALLY")
-        votes   = sum(1 for r in rows if r["action"]=="VOTE")
-        props   = sum(1 for r in rows if r["action"]=="PROPOSE")
-        sanc    = sum(1 for r in rows if r["action"]=="SANCTION")
-        power_gini = compute_power_gini(rows)
-        st.metric("Hierarchy (pecks/total)", f"{(pecks/total):.2f}")
-        st.metric("Policy Inertia (props - votes)", props - votes)
-        st.metric("Coalitions", allies)
-        st.metric("Rumor Activity", rumors)
-        st.metric("Sanctions", sanc)
-        st.metric("Power Gini", power_gini)
+    if snap["n_events"]:
+        m = snap["metrics"]
+        st.metric("Hierarchy (pecks/total)", f"{m['hierarchy_steepness']:.2f}")
+        st.metric("Policy Inertia (props - votes)", m["policy_inertia"])
+        st.metric("Coalitions", m["coalitions"])
+        st.metric("Rumor Activity", m["rumors"])
+        st.metric("Sanctions", m["sanctions"])
+        st.metric("Power Gini", compute_power_gini(snap["peck_counts"]))
     else:
         st.caption("Metrics populate after a few ticks.")
 
-# ---------- Memories ----------
-st.subheader("Memories")
-if mems:
-    for agent, mlist in mems.items():
-        st.markdown(f"**{agent}**")
-        for m in mlist[-3:]:
-            st.caption(f"- {m.get('event','')}")
-else:
-    st.caption("No memories yet.")
+
+@st.fragment(run_every=refresh)
+def memory_panel():
+    snap = player.latest()
+    st.subheader("Memories")
+    if any(snap["memories"].values()):
+        for agent, mlist in snap["memories"].items():
+            st.markdown(f"**{agent}**")
+            for m in mlist:
+                st.caption(f"- {m}")
+    else:
+        st.caption("No memories yet.")
+
+
+@st.fragment(run_every=refresh * 4 if refresh else None)
+def usage_panel():
+    usage = player.latest()["usage"]
+    st.subheader("Inference Usage")
+    if not usage["requests"]:
+        st.caption("No LLM requests yet (mock hens are free).")
+        return
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Tokens / sec", usage["tokens_per_s"])
+    c2.metric("Cost / tick", f"${usage['cost_per_tick']:.5f}")
+    c3.metric("Cache hit rate", f"{usage['cache_hit_rate']:.0%}")
+    c4.metric("Mean latency", f"{usage['mean_latency_s']:.2f}s")
+    st.caption("Most expensive hens")
+    st.table([{"hen": h["agent"], "tokens": h["tokens"], "requests": h["requests"],
+               "latency (s)": h["latency_s"], "cost ($)": h["cost"]} for h in usage["top_hens"]])
+
+
+feed_panel()
+
+st.subheader("Coop Map & Metrics")
+col1, col2 = st.columns([1.2, 1])
+with col1:
+    map_panel()
+with col2:
+    metrics_panel()
+
+memory_panel()
+usage_panel()
 
 # ---------- End Session ----------
 if st.button("End Session", use_container_width=True):
-    my_rows = [r for r in rows if r["agent"]=="hen_human"]
+    if not shared:
+        player.stop()  # a shared coop keeps running for the other sessions
+    events = engine.history
     score = 0
-    score += sum(1 for r in my_rows if r["action"] in ("PROPOSE","VOTE")) * 2
-    score += sum(1 for r in my_rows if r["action"]=="ALLY")
-    score -= sum(1 for r in my_rows if r["action"] in ("GOSSIP","spread_rumor"))
+    score += events.count(("PROPOSE","VOTE"), agent="hen_human") * 2
+    score += events.count("ALLY", agent="hen_human")
+    score -= events.count("GOSSIP", agent="hen_human")
     title = "DEMOCRACY DEFENDER" if score>=5 else "GOSSIP LORD" if score<=-1 else "PRAGMATIC HEN"
     st.session_state.final_score = score
     st.session_state.final_title = title